@@ -1,37 +1,129 @@
 import os
-from typing import List, Dict, Any, Optional
-from langgraph.prebuilt import create_react_agent
+import asyncio
+import atexit
+import functools
+import re
+from dataclasses import dataclass
+import threading
+import weakref
+from typing import List, Dict, Any, Optional, AsyncIterator
+from langgraph.prebuilt import create_react_agent, ToolNode
 from langchain_core.runnables import Runnable
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.tools import Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain_tavily import TavilySearch
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
-from langchain_experimental.tools.python.tool import PythonREPLTool
-from crawler import SimpleCrawl4AITool, AdvancedCrawl4AITool, SmartExtractionTool, BatchCrawl4AITool
-from custom_tools import CustomSemanticScholarQueryRun
-import json
-import sys
-from io import StringIO
-import traceback
-import re
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field  # Import Pydantic at the top for BaseModel usage
 load_dotenv()
 
-# Import RAG tools
-import asyncio
-from rag import search_documents_tool, store_document_tool, get_document_tool
 
-# Import Google Generative AI types for GenerationConfig and SafetySettings
-from google.generativeai.types import GenerationConfig, HarmCategory, HarmBlockThreshold
+@dataclass(frozen=True)
+class _AgentEnv:
+    """Environment configuration, read once at import (keys do not change for the process lifetime)."""
+    google_key: Optional[str]
+    tavily_key: Optional[str]
+    openrouter_key: Optional[str]
+    debug_tool_log: bool
+
+    @classmethod
+    def from_environ(cls) -> "_AgentEnv":
+        return cls(
+            google_key=os.getenv("GOOGLE_API_KEY"),
+            tavily_key=os.getenv("TAVILY_API_KEY"),
+            openrouter_key=os.getenv("OPENROUTER_API_KEY"),
+            debug_tool_log=os.getenv('DEBUG_TOOL_LOG', '').lower() in ('1','true','yes','on'),
+        )
+
+
+_ENV = _AgentEnv.from_environ()
+if not _ENV.tavily_key:
+    # Reported at startup; create_agent still raises so callers can surface it per request
+    print("Warning: TAVILY_API_KEY is not set; agent creation will fail")
 
 # RAG tool functions for module-level access
-from rag import search_documents_tool as search_documents
-from rag import store_document_tool as store_document
-from rag import get_document_tool as get_document_info
+from rag import (
+    search_documents_tool as search_documents,
+    batch_search_documents_tool as batch_search_documents,
+    store_document_tool as store_document,
+    get_document_tool as get_document_info,
+    aclose_rag_manager,
+)
+
+# Persistent event loop for running async RAG calls from the sync tool wrappers.
+# Reusing one loop keeps client connections warm instead of rebuilding them per call.
+_bg_loop = asyncio.new_event_loop()
+threading.Thread(target=_bg_loop.run_forever, name="agent-bg-loop", daemon=True).start()
+
+def _run_async(coro):
+    """Run a coroutine on the background loop and block until it completes."""
+    return asyncio.run_coroutine_threadsafe(coro, _bg_loop).result()
+
+def shutdown_background_loop():
+    """Close the background loop's HTTP client and stop the loop; safe to call more than once."""
+    if not _bg_loop.is_running():
+        return
+    try:
+        _run_async(aclose_rag_manager())
+    finally:
+        _bg_loop.call_soon_threadsafe(_bg_loop.stop)
+
+atexit.register(shutdown_background_loop)
+
+# For async RAG functions, we need sync wrappers for the agent tools
+# (RAGManager caches repeated and near-duplicate searches itself)
+def sync_search_documents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Synchronous wrapper for search_documents_tool"""
+    return _run_async(search_documents(query, limit))
+
+def sync_batch_search_documents(queries: List[str], limit: int = 5) -> List[List[Dict[str, Any]]]:
+    """Synchronous wrapper for batch_search_documents_tool"""
+    return _run_async(batch_search_documents(queries, limit))
+
+def sync_store_document(content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Synchronous wrapper for store_document_tool"""
+    return _run_async(store_document(content, metadata))
+
+def sync_get_document_info(document_id: str) -> Optional[Dict[str, Any]]:
+    """Synchronous wrapper for get_document_tool"""
+    return _run_async(get_document_info(document_id))
+
+# Explicit "search the documents for X" requests are answered straight from the RAG database
+_DOCS = r"(?:my|the|our)\s+(?:docs|documents|document\s+database|knowledge\s+base|rag\s+database)"
+_FAST_PATH_PATTERNS = (
+    re.compile(rf"^\s*(?:please\s+)?(?:search|look\s*up|check)\s+(?:in\s+)?{_DOCS}\s+(?:for|about|on)\s+(?P<q>.+?)[\s?.!]*$", re.IGNORECASE),
+    re.compile(rf"^\s*(?:please\s+)?(?:search\s+for|look\s*up|find)\s+(?P<q>.+?)\s+in\s+{_DOCS}[\s?.!]*$", re.IGNORECASE),
+)
+
+def maybe_fast_path(query: str, limit: int = 5) -> Optional[str]:
+    """Answer pure document-lookup requests without running the agent.
+
+    Returns formatted search results, or None when the query is not a plain
+    retrieval request or nothing relevant was found (the caller then falls back
+    to the full agent).
+    """
+    for pattern in _FAST_PATH_PATTERNS:
+        match = pattern.match(query)
+        if match:
+            break
+    else:
+        return None
+
+    search_query = match.group("q").strip()
+    try:
+        results = sync_search_documents(search_query, limit)
+    except Exception as e:
+        print(f"Fast path search failed, falling back to agent: {e}")
+        return None
+    if not results:
+        return None
+
+    lines = [f'Results from the document database for "{search_query}":', ""]
+    for i, doc in enumerate(results, 1):
+        source = doc.get("source_url") or (doc.get("metadata") or {}).get("source") or doc.get("source_type") or "unknown"
+        content = doc.get("content", "")
+        snippet = content if len(content) <= 500 else content[:500] + "..."
+        lines.append(f"{i}. {snippet}\n   _Source: {source} (similarity {doc.get('similarity', 0):.2f})_")
+    return "\n".join(lines)
+
 # Initialize the global list to store captured figures
 _captured_figures: List[str] = []
 
@@ -48,8 +140,9 @@ def clear_captured_figures():
     _captured_figures.clear()
     print(f"Cleared {count} captured figures")
 
+@functools.lru_cache(maxsize=1)
 def load_system_prompt() -> str:
-    """Load the system prompt from the esi_agent_instruction.md file."""
+    """Load the system prompt from the esi_agent_instruction.md file (cached after first read)."""
     try:
         with open("server/esi_agent_instruction.md", "r", encoding="utf-8") as file:
             return file.read()
@@ -77,8 +170,49 @@ When creating visualizations:
 
 Always cite your sources and provide accurate, helpful information."""
 
+# Upper bound on tool calls executed concurrently when the model emits several in one turn
+_MAX_TOOL_CONCURRENCY = 5
+
+# Slots for sync tool calls, shared by every agent
+_tool_slots = threading.BoundedSemaphore(_MAX_TOOL_CONCURRENCY)
+
+# Slots for async tool calls; an asyncio.Semaphore binds to one loop, so each loop gets its own
+_async_tool_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def _get_async_tool_slots() -> asyncio.Semaphore:
+    """Return the running loop's semaphore bounding concurrent async tool calls."""
+    loop = asyncio.get_running_loop()
+    slots = _async_tool_slots.get(loop)
+    if slots is None:
+        slots = _async_tool_slots.setdefault(loop, asyncio.Semaphore(_MAX_TOOL_CONCURRENCY))
+    return slots
+
+class _BoundedToolNode(ToolNode):
+    """ToolNode that runs at most _MAX_TOOL_CONCURRENCY tool calls at once, on the sync and async paths."""
+
+    def _run_one(self, *args, **kwargs):
+        with _tool_slots:
+            return super()._run_one(*args, **kwargs)
+
+    async def _arun_one(self, *args, **kwargs):
+        # Cancelling a waiter simply abandons the wait, so no slot can leak
+        async with _get_async_tool_slots():
+            return await super()._arun_one(*args, **kwargs)
+
+# Verbosity-specific instructions appended to the system prompt (3 = default, no suffix)
+_VERBOSITY_SUFFIX = {
+    1: "\n\nYour responses should be extremely concise and laconic. Get straight to the point.",
+    2: "\n\nYour responses should be concise and to the point, avoiding unnecessary details.",
+    4: "\n\nYour responses should be detailed and provide ample explanation.",
+    5: "\n\nYour responses should be extremely verbose, comprehensive, and elaborate on all points.",
+}
+
 def create_tavily_tool() -> Tool:
     """Create the Tavily search tool."""
+    from langchain_tavily import TavilySearch
+
     # Initialize Tavily search
     tavily_search = TavilySearch(
         max_results=5,
@@ -95,11 +229,43 @@ def create_tavily_tool() -> Tool:
     )
 
 
+class SearchDocumentsArgs(BaseModel):
+    query: str = Field(..., description="Search query string")
+    limit: int = Field(5, description="Maximum number of results to return")
+
+class BatchSearchArgs(BaseModel):
+    queries: List[str] = Field(..., description="List of search query strings")
+    limit: int = Field(5, description="Maximum number of results to return per query")
+
+class StoreDocumentArgs(BaseModel):
+    content: str = Field(..., description="Document content to store")
+    metadata: Optional[Dict[str, Any]] = Field(None, description="Optional metadata for the document")
+
+class GetDocumentInfoArgs(BaseModel):
+    document_id: str = Field(..., description="ID of the document to retrieve")
+
+class CrawlArgs(BaseModel):
+    url: str = Field(..., description="URL to scrape")
+    css_selector: Optional[str] = Field(None, description="Optional CSS selector")
+    extraction_strategy: str = Field("text", description="text | markdown | structured")
+    word_count_threshold: int = Field(10, description="Minimum words per block")
+    only_text: bool = Field(True, description="Whether to keep only text")
+
+class SmartArgs(BaseModel):
+    url: str = Field(..., description="URL to scrape")
+    extraction_prompt: str = Field(..., description="Instruction for extraction")
+
+class BatchArgs(BaseModel):
+    urls: List[str] = Field(..., description="List of URLs")
+    max_concurrent: int = Field(3, description="Max concurrency")
+
+
 class DebugLogHandler:
+    _INDENTS = tuple('  ' * i for i in range(32))
     def __init__(self):
         self._indent = 0
     def _p(self, msg):
-        print(f"[DEBUG] {'  '*self._indent}{msg}")
+        print(f"[DEBUG] {self._INDENTS[min(self._indent, 31)]}{msg}")
     # Tool lifecycle
     def on_tool_start(self, serialized, input_str, **kwargs):
         name = (serialized or {}).get('name') or 'tool'
@@ -130,112 +296,52 @@ class DebugLogHandler:
     def on_chain_error(self, *a, **k): pass
 
 
-def create_agent(temperature: float = 0.5, model: str = "gemini-2.5-flash", verbosity: int = 3, llm: Optional[Runnable] = None, debug: Optional[bool] = None) -> Runnable:
-    """Create and configure the React agent with tools.
-    If `llm` is provided, it will be used instead of constructing a new one.
-    """
-    
-    # Load environment variables
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    tavily_api_key = os.getenv("TAVILY_API_KEY")
-    openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
- 
-    
-    if not tavily_api_key:
-        raise ValueError("TAVILY_API_KEY environment variable is required")
-    
-    # Initialize the LLM based on the selected model
-    if llm is None:
-        if model.startswith("gemini"):
-            if not google_api_key:
-                raise ValueError("GOOGLE_API_KEY environment variable is required for Gemini models")
-            llm = ChatGoogleGenerativeAI(
-                model=model,
-                temperature=temperature,
-                google_api_key=google_api_key,
-                callbacks=None if llm is None else llm.callbacks,  # Use callbacks from provided LLM if available
-                # Explicitly define generation_config to avoid Modality error
-                generation_config=GenerationConfig(
-                    candidate_count=1,
-                    stop_sequences=[],
-                ),
-                # Add default safety settings
-                safety_settings={
-                    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                },
-            )
-        else: # Assume OpenRouter model
-            if not openrouter_api_key:
-                raise ValueError("OPENROUTER_API_KEY environment variable is required for OpenRouter models")
-            llm = ChatOpenAI(
-                model=model,
-                temperature=temperature,
-                openai_api_key=openrouter_api_key, # Use openai_api_key for OpenRouter
-                base_url="https://openrouter.ai/api/v1",
-                callbacks=None,
-            )
+@functools.lru_cache(maxsize=1)
+def _build_tools() -> tuple:
+    """Build the stateless agent tools once; later calls return the cached tuple."""
+    # Tool dependencies (crawl4ai, Wikipedia, Semantic Scholar, ...) are imported on first build
+    from langchain_community.tools import WikipediaQueryRun
+    from langchain_community.utilities import WikipediaAPIWrapper
+    from crawler import (
+        SimpleCrawl4AITool, AdvancedCrawl4AITool, SmartExtractionTool, BatchCrawl4AITool, get_crawler_tool,
+        crawl_url, smart_extract, batch_crawl,
+    )
+    from custom_tools import CustomSemanticScholarQueryRun
 
-    # Add debug callbacks if requested
-    env_debug = os.getenv('DEBUG_TOOL_LOG', '').lower() in ('1','true','yes','on')
-    is_debug_enabled = (debug is True) or env_debug
-    
-    # Create tools
     tools = [
         create_tavily_tool(),
         CustomSemanticScholarQueryRun(top_k_results=10),
         WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper()),
-        PythonREPLTool(),
     ]
     
     # Add RAG tools
     try:
         from langchain.tools import StructuredTool
         
-        # For async functions, we need to create sync wrappers
-        def sync_search_documents(query: str, limit: int = 5) -> List[Dict[str, Any]]:
-            """Synchronous wrapper for search_documents_tool"""
-            return asyncio.run(search_documents(query, limit))
-        
-        def sync_store_document(content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
-            """Synchronous wrapper for store_document_tool"""
-            return asyncio.run(store_document(content, metadata))
-        
-        def sync_get_document_info(document_id: str) -> Optional[Dict[str, Any]]:
-            """Synchronous wrapper for get_document_tool"""
-            return asyncio.run(get_document_info(document_id))
-        
         tools.extend([
             StructuredTool.from_function(
                 name="search_documents",
                 description="Search for documents in the RAG database using semantic search. Use this to find relevant information from previously ingested documents.",
                 func=sync_search_documents,
-                args_schema=type('SearchDocumentsArgs', (BaseModel,), {
-                    'query': Field(..., description="Search query string"),
-                    'limit': Field(5, description="Maximum number of results to return"),
-                    '__annotations__': {'query': str, 'limit': int}
-                })
+                args_schema=SearchDocumentsArgs
+            ),
+            StructuredTool.from_function(
+                name="batch_search_documents",
+                description="Run several semantic searches over the RAG database in one call. Use this instead of repeated search_documents calls when you need context for multiple sub-questions; returns one result list per query.",
+                func=sync_batch_search_documents,
+                args_schema=BatchSearchArgs
             ),
             StructuredTool.from_function(
                 name="store_document",
                 description="Store a document in the RAG database for future retrieval. Use this to save important information for later use.",
                 func=sync_store_document,
-                args_schema=type('StoreDocumentArgs', (BaseModel,), {
-                    'content': Field(..., description="Document content to store"),
-                    'metadata': Field(None, description="Optional metadata for the document"),
-                    '__annotations__': {'content': str, 'metadata': Optional[Dict[str, Any]]}
-                })
+                args_schema=StoreDocumentArgs
             ),
             StructuredTool.from_function(
                 name="get_document_info",
                 description="Retrieve a specific document by ID from the RAG database. Use this to get detailed information about a specific document.",
                 func=sync_get_document_info,
-                args_schema=type('GetDocumentInfoArgs', (BaseModel,), {
-                    'document_id': Field(..., description="ID of the document to retrieve"),
-                    '__annotations__': {'document_id': str}
-                })
+                args_schema=GetDocumentInfoArgs
             ),
         ])
     except Exception as e:
@@ -245,41 +351,11 @@ def create_agent(temperature: float = 0.5, model: str = "gemini-2.5-flash", verb
     try:
         from langchain.tools import StructuredTool
 
-        class CrawlArgs(BaseModel):
-            url: str = Field(..., description="URL to scrape")
-            css_selector: Optional[str] = Field(None, description="Optional CSS selector")
-            extraction_strategy: str = Field("text", description="text | markdown | structured")
-            word_count_threshold: int = Field(10, description="Minimum words per block")
-            only_text: bool = Field(True, description="Whether to keep only text")
-
-        # Bind to existing implementations but enforce schema and string return
-        simple_tool = SimpleCrawl4AITool()
-        def simple_crawl(url: str, css_selector: Optional[str] = None, extraction_strategy: str = "text", word_count_threshold: int = 10, only_text: bool = True) -> str:
-            out = simple_tool.run(url=url, css_selector=css_selector, extraction_strategy=extraction_strategy, word_count_threshold=word_count_threshold, only_text=only_text)
-            return out if isinstance(out, str) else str(out)
-
-        advanced_tool = AdvancedCrawl4AITool()
-        def advanced_crawl(url: str, css_selector: Optional[str] = None, extraction_strategy: str = "text", word_count_threshold: int = 10, only_text: bool = True) -> str:
-            out = advanced_tool.run(url=url, css_selector=css_selector, extraction_strategy=extraction_strategy, word_count_threshold=word_count_threshold, only_text=only_text)
-            return out if isinstance(out, str) else (json.dumps(out) if out is not None else "")
-
-        class SmartArgs(BaseModel):
-            url: str = Field(..., description="URL to scrape")
-            extraction_prompt: str = Field(..., description="Instruction for extraction")
-
-        smart_tool = SmartExtractionTool()
-        def smart_extract(url: str, extraction_prompt: str) -> str:
-            out = smart_tool.run(url=url, extraction_prompt=extraction_prompt)
-            return out if isinstance(out, str) else (json.dumps(out) if out is not None else "")
-
-        class BatchArgs(BaseModel):
-            urls: List[str] = Field(..., description="List of URLs")
-            max_concurrent: int = Field(3, description="Max concurrency")
-
-        batch_tool = BatchCrawl4AITool()
-        def batch_crawl(urls: List[str], max_concurrent: int = 3) -> str:
-            out = batch_tool.run(urls=urls, max_concurrent=max_concurrent)
-            return out if isinstance(out, str) else (json.dumps(out) if out is not None else "")
+        # Bind the shared tool instances to module-level wrappers that enforce the schema
+        simple_crawl = functools.partial(crawl_url, get_crawler_tool(SimpleCrawl4AITool))
+        advanced_crawl = functools.partial(crawl_url, get_crawler_tool(AdvancedCrawl4AITool))
+        smart_extract_url = functools.partial(smart_extract, get_crawler_tool(SmartExtractionTool))
+        batch_crawl_urls = functools.partial(batch_crawl, get_crawler_tool(BatchCrawl4AITool))
 
         tools.extend([
             StructuredTool.from_function(
@@ -297,39 +373,97 @@ def create_agent(temperature: float = 0.5, model: str = "gemini-2.5-flash", verb
             StructuredTool.from_function(
                 name="smart_extraction",
                 description="LLM-guided extraction from a URL using Crawl4AI.",
-                func=smart_extract,
+                func=smart_extract_url,
                 args_schema=SmartArgs,
             ),
             StructuredTool.from_function(
                 name="batch_crawl4ai",
                 description="Batch scrape multiple URLs using Crawl4AI.",
-                func=batch_crawl,
+                func=batch_crawl_urls,
                 args_schema=BatchArgs,
             ),
         ])
     except Exception as _e:
         # If wrapping fails, fall back to the original tool classes
         tools.extend([
-            SimpleCrawl4AITool(),
-            AdvancedCrawl4AITool(),
-            SmartExtractionTool(),
-            BatchCrawl4AITool(),
+            get_crawler_tool(SimpleCrawl4AITool),
+            get_crawler_tool(AdvancedCrawl4AITool),
+            get_crawler_tool(SmartExtractionTool),
+            get_crawler_tool(BatchCrawl4AITool),
         ])
 
+    return tuple(tools)
+
+
+@functools.lru_cache(maxsize=16)
+def _get_llm(model: str, temperature: float, streaming: bool = False) -> Runnable:
+    """Build the chat model for `model`; instances (and their HTTP/gRPC clients) are reused per (model, temperature, streaming)."""
+    if model.startswith("gemini"):
+        if not _ENV.google_key:
+            raise ValueError("GOOGLE_API_KEY environment variable is required for Gemini models")
+        # Gemini dependencies (grpc, protobuf) are only loaded when a Gemini model is requested
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # Import Google Generative AI types for GenerationConfig and SafetySettings
+        from google.generativeai.types import GenerationConfig, HarmCategory, HarmBlockThreshold
+        return ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            google_api_key=_ENV.google_key,
+            # Explicitly define generation_config to avoid Modality error
+            generation_config=GenerationConfig(
+                candidate_count=1,
+                stop_sequences=[],
+            ),
+            # Add default safety settings
+            safety_settings={
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            },
+        )
+    else: # Assume OpenRouter model
+        if not _ENV.openrouter_key:
+            raise ValueError("OPENROUTER_API_KEY environment variable is required for OpenRouter models")
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            openai_api_key=_ENV.openrouter_key, # Use openai_api_key for OpenRouter
+            base_url="https://openrouter.ai/api/v1",
+            streaming=streaming,
+            callbacks=None,
+        )
+
+
+def create_agent(temperature: float = 0.5, model: str = "gemini-2.5-flash", verbosity: int = 3, llm: Optional[Runnable] = None, debug: Optional[bool] = None, streaming: bool = False) -> Runnable:
+    """Create and configure the React agent with tools.
+    If `llm` is provided, it will be used instead of constructing a new one.
+    Otherwise the LLM is reused per (model, temperature, streaming); the graph is compiled per call so
+    each agent gets its own Python REPL namespace. Per-request callbacks go in the invoke config.
+    """
+    
+    if not _ENV.tavily_key:
+        raise ValueError("TAVILY_API_KEY environment variable is required")
+    
+    # Add debug callbacks if requested
+    is_debug_enabled = (debug is True) or _ENV.debug_tool_log
+
+    if llm is None:
+        llm = _get_llm(model, round(temperature, 2), streaming)
+    return _build_agent(llm, verbosity, is_debug_enabled)
 
-    # Load system prompt
-    system_prompt = load_system_prompt()
+def _build_agent(llm: Runnable, verbosity: int, is_debug_enabled: bool) -> Runnable:
+    """Compile the React agent graph around `llm`."""
+    from langchain_experimental.tools.python.tool import PythonREPLTool
+
+    # Stateless tools are built once and shared; the REPL keeps variables between calls,
+    # so every agent gets its own rather than sharing one namespace across users
+    tools = [*_build_tools(), PythonREPLTool()]
+
+    # Load system prompt and adjust it based on verbosity
+    system_prompt = load_system_prompt() + _VERBOSITY_SUFFIX.get(verbosity, "")
 
-    # Adjust system prompt based on verbosity
-    if verbosity == 1:
-        system_prompt += "\n\nYour responses should be extremely concise and laconic. Get straight to the point."
-    elif verbosity == 2:
-        system_prompt += "\n\nYour responses should be concise and to the point, avoiding unnecessary details."
-    elif verbosity == 4:
-        system_prompt += "\n\nYour responses should be detailed and provide ample explanation."
-    elif verbosity == 5:
-        system_prompt += "\n\nYour responses should be extremely verbose, comprehensive, and elaborate on all points."
-    
     # Build proper chat prompt with system + conversation placeholder
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
@@ -337,14 +471,54 @@ def create_agent(temperature: float = 0.5, model: str = "gemini-2.5-flash", verb
     ])
 
     # Create the React agent
-    agent = create_react_agent(
+    # ToolNode dispatches all tool calls from a single AI message concurrently
+    # (thread pool for sync invoke, asyncio.gather for ainvoke) instead of one by one;
+    # the bounded node caps how many run at once so a burst does not flood outbound HTTP
+    return create_react_agent(
         llm,
-        tools=tools,
+        tools=_BoundedToolNode(tools),
         prompt=prompt,
         debug=is_debug_enabled,
     )
 
-    return agent
+async def batch_stream(agen: AsyncIterator[str], timeout: float = 0.05, max_chars: int = 256) -> AsyncIterator[str]:
+    """Coalesce streamed text chunks into larger ones.
+    A batch is yielded once it reaches `max_chars` or `timeout` seconds after its first chunk arrived.
+    """
+    loop = asyncio.get_running_loop()
+    it = agen.__aiter__()
+    buf: List[str] = []
+    size = 0
+    deadline = 0.0
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            wait = max(0.0, deadline - loop.time()) if buf else None
+            done, _ = await asyncio.wait({pending}, timeout=wait)
+            if not done:
+                # Timed out with buffered text: flush and keep waiting on the same chunk
+                yield "".join(buf)
+                buf, size = [], 0
+                continue
+            task, pending = pending, None
+            try:
+                chunk = task.result()
+            except StopAsyncIteration:
+                break
+            if not buf:
+                deadline = loop.time() + timeout
+            buf.append(chunk)
+            size += len(chunk)
+            if size >= max_chars:
+                yield "".join(buf)
+                buf, size = [], 0
+        if buf:
+            yield "".join(buf)
+    finally:
+        if pending is not None:
+            pending.cancel()
 
 if __name__ == "__main__":
     # Test the agent creation
@@ -353,6 +527,7 @@ if __name__ == "__main__":
         os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY", "YOUR_DUMMY_GOOGLE_API_KEY")
         os.environ["TAVILY_API_KEY"] = os.getenv("TAVILY_API_KEY", "YOUR_DUMMY_TAVILY_API_KEY")
         os.environ["OPENROUTER_API_KEY"] = os.getenv("OPENROUTER_API_KEY", "YOUR_DUMMY_OPENROUTER_API_KEY")
+        _ENV = _AgentEnv.from_environ()
 
 
         print("Testing agent creation with default Gemini model...")
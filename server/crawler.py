@@ -1,4 +1,5 @@
 import asyncio
+import threading
 from crawl4ai import AsyncWebCrawler
 from crawl4ai.extraction_strategy import LLMExtractionStrategy
 from langchain.tools import BaseTool
@@ -6,6 +7,17 @@ from typing import Optional, Type, Dict, Any
 from pydantic import BaseModel, Field
 import json
 
+try:
+    import orjson
+
+    def json_dumps(obj: Any, indent: bool = False) -> str:
+        """Serialize to a JSON string using orjson."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+except ImportError:  # Fall back to the stdlib encoder
+    def json_dumps(obj: Any, indent: bool = False) -> str:
+        """Serialize to a JSON string using the stdlib json module."""
+        return json.dumps(obj, indent=2 if indent else None)
+
 class Crawl4AIInput(BaseModel):
     """Input for the Crawl4AI scraper tool."""
     url: str = Field(description="The URL to scrape")
@@ -46,7 +58,7 @@ class SimpleCrawl4AITool(BaseTool):
                 
                 if result.success:
                     if extraction_strategy == "markdown":
-                        return result.markdown
+                        return str(result.markdown or "")
                     elif extraction_strategy == "structured":
                         return f"Title: {result.title}\n\nContent: {result.cleaned_html[:2000]}..."
                     else:
@@ -87,14 +99,14 @@ class AdvancedCrawl4AITool(BaseTool):
                 )
                 
                 if result.success:
-                    return {
+                    return json_dumps({
                         "url": url,
                         "title": result.title,
                         "content": result.cleaned_html[:3000],
                         "markdown": result.markdown[:3000] if result.markdown else None,
                         "links": result.links,
                         "media": result.media
-                    }
+                    })
                 else:
                     return f"Failed to scrape {url}: {result.error_message}"
                     
@@ -135,7 +147,7 @@ class SmartExtractionTool(BaseTool):
                 )
                 
                 if result.success:
-                    return result.extracted_content
+                    return result.extracted_content or ""
                 else:
                     return f"Failed to extract from {url}: {result.error_message}"
                     
@@ -182,8 +194,36 @@ class BatchCrawl4AITool(BaseTool):
                 tasks = [scrape_url(url) for url in urls]
                 results = await asyncio.gather(*tasks)
                 
-                return json.dumps(results, indent=2)
+                return json_dumps(results, indent=True)
                 
         except Exception as e:
             return f"Error in batch scraping: {str(e)}"
 
+
+# Wrappers used to expose the tools as StructuredTools; the tool instance is bound
+# as the first argument with functools.partial. Every tool's _arun returns a str
+# (structured results are serialized inside the tool), so no conversion is needed here.
+def crawl_url(tool: BaseTool, url: str, css_selector: Optional[str] = None, extraction_strategy: str = "text",
+              word_count_threshold: int = 10, only_text: bool = True) -> str:
+    return tool.run({"url": url, "css_selector": css_selector, "extraction_strategy": extraction_strategy, "word_count_threshold": word_count_threshold, "only_text": only_text})
+
+def smart_extract(tool: BaseTool, url: str, extraction_prompt: str) -> str:
+    return tool.run({"url": url, "extraction_prompt": extraction_prompt})
+
+def batch_crawl(tool: BaseTool, urls: list[str], max_concurrent: int = 3) -> str:
+    return tool.run({"urls": urls, "max_concurrent": max_concurrent})
+
+
+# Process-wide tool instances, shared by the agent and the ingestion pipeline
+_tool_instances: Dict[type, BaseTool] = {}
+_tool_lock = threading.Lock()
+
+def get_crawler_tool(tool_cls: Type[BaseTool]) -> BaseTool:
+    """Return the shared instance of a crawler tool class, creating it on first use."""
+    tool = _tool_instances.get(tool_cls)
+    if tool is None:
+        with _tool_lock:
+            tool = _tool_instances.get(tool_cls)
+            if tool is None:
+                tool = _tool_instances[tool_cls] = tool_cls()
+    return tool
@@ -4,6 +4,19 @@ import re
 from langchain_community.utilities.semanticscholar import SemanticScholarAPIWrapper
 from langchain_community.tools.semanticscholar.tool import SemanticScholarQueryRun
 
+_AUTHOR_RE = re.compile(r"(?:papers by|author:|from)\s+(.*)", re.IGNORECASE)
+_OPTIONAL_FIELDS = frozenset(("Journal", "Volume", "Pages", "DOI"))
+
+_author_client = None
+
+def _get_author_client():
+    """Return a shared SemanticScholar client for author lookups."""
+    global _author_client
+    if _author_client is None:
+        from semanticscholar import SemanticScholar
+        _author_client = SemanticScholar()
+    return _author_client
+
 class CustomSemanticScholarAPIWrapper(SemanticScholarAPIWrapper):
     """
     Wrapper around semanticscholar.org API that returns complete citations.
@@ -27,53 +40,72 @@ class CustomSemanticScholarAPIWrapper(SemanticScholarAPIWrapper):
     def run(self, query: str) -> str:
         """Run the Semantic Scholar API and get complete citations."""
         
+        # Only top_k_results are formatted, so fetch a single page of that size
+        # rather than load_max_docs results across several paginated requests
+        limit = min(self.load_max_docs, self.top_k_results)
+
         # Check if the query is for a specific author
-        author_match = re.match(r"(?:papers by|author:|from)\s+(.*)", query, re.IGNORECASE)
+        author_match = _AUTHOR_RE.match(query)
         if author_match:
             author_name = author_match.group(1).strip()
             try:
-                from semanticscholar import SemanticScholar
-                sch = SemanticScholar()
-                authors = sch.search_author(author_name)
+                sch = _get_author_client()
+                # The paper lookup needs the author id, so the two requests stay sequential
+                authors = sch.search_author(author_name, fields=["authorId"], limit=1)
                 if not authors or not authors[0]:
                     return f"Could not find author: {author_name}"
                 
                 # Assume the first result is the correct author
                 author_id = authors[0].authorId
-                results = sch.get_author_papers(author_id, limit=self.load_max_docs, fields=self.returned_fields)
+                results = sch.get_author_papers(author_id, limit=limit, fields=self.returned_fields)
             except Exception as e:
                 return f"An error occurred during author search: {e}"
         else:
             results = self.semanticscholar_search(
-                query, limit=self.load_max_docs, fields=self.returned_fields
+                query, limit=limit, fields=self.returned_fields
             )
 
         documents = []
+        seen_ids = set()
+        # Track the joined length so citations past doc_content_chars_max are never built into the output
+        max_chars = self.doc_content_chars_max
+        total_chars = 0
+        tail = ""
         for item in results[: self.top_k_results]:
+            paper_id = getattr(item, "paperId", None)
+            if paper_id is not None:
+                if paper_id in seen_ids:
+                    continue
+                seen_ids.add(paper_id)
             authors = ", ".join(
                 author["name"] for author in getattr(item, "authors", [])
             )
-            journal_name = getattr(getattr(item, "journal", {}), "name", None)
-            journal_volume = getattr(getattr(item, "journal", {}), "volume", None)
-            journal_pages = getattr(getattr(item, "journal", {}), "pages", None)
-            doi = getattr(item, "externalIds", {}).get("DOI", None)
-            
-            citation = f"Authors: {authors}\n"
-            citation += f"Year: {getattr(item, 'year', None)}\n"
-            citation += f"Title: {getattr(item, 'title', None)}\n"
-            if journal_name:
-                citation += f"Journal: {journal_name}\n"
-            if journal_volume:
-                citation += f"Volume: {journal_volume}\n"
-            if journal_pages:
-                citation += f"Pages: {journal_pages}\n"
-            if doi:
-                citation += f"DOI: {doi}\n"
-            citation += f"Abstract: {getattr(item, 'abstract', None)}\n"
+            journal = getattr(item, "journal", {})
+            fields = (
+                ("Authors", authors),
+                ("Year", getattr(item, "year", None)),
+                ("Title", getattr(item, "title", None)),
+                ("Journal", getattr(journal, "name", None)),
+                ("Volume", getattr(journal, "volume", None)),
+                ("Pages", getattr(journal, "pages", None)),
+                ("DOI", getattr(item, "externalIds", {}).get("DOI", None)),
+                ("Abstract", getattr(item, "abstract", None)),
+            )
+            # Journal details and DOI are only listed when present
+            citation = "".join(
+                f"{label}: {value}\n" for label, value in fields
+                if value or label not in _OPTIONAL_FIELDS
+            )
+            added = len(citation) + (2 if documents else 0)
+            if max_chars is not None and total_chars + added > max_chars:
+                # Keep the part of this citation (and its separator) that still fits, then stop
+                tail = (("\n\n" if documents else "") + citation)[: max_chars - total_chars]
+                break
             documents.append(citation)
+            total_chars += added
 
-        if documents:
-            return "\n\n".join(documents)[: self.doc_content_chars_max]
+        if documents or tail:
+            return "\n\n".join(documents) + tail
         else:
             return "No results found."
 
@@ -0,0 +1,29 @@
+"""
+HTML parsing for DocumentIngester.ingest_webpage, run in its process pool.
+Kept free of the rest of the server's imports so spawned workers start quickly.
+"""
+
+from typing import Optional, Tuple
+
+from bs4 import BeautifulSoup
+from markdownify import MarkdownConverter
+
+
+def parse_html(html_content: str, keep_markdown: bool = False) -> Tuple[str, Optional[str], Optional[str]]:
+    """Parse HTML once and return (clean text, markdown or None, title)."""
+    soup = BeautifulSoup(html_content, 'lxml')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    # Get whitespace-normalized text content
+    text_content = soup.get_text(separator=' ', strip=True)
+    
+    # Convert the cleaned tree to markdown for better structure, without re-parsing it
+    markdown_content = None
+    if keep_markdown:
+        markdown_content = MarkdownConverter(heading_style="ATX").convert_soup(soup)
+    
+    title = str(soup.title.string) if soup.title and soup.title.string else None
+    return text_content, markdown_content, title
@@ -4,41 +4,195 @@ Handles various document formats and web content ingestion.
 """
 
 import os
+import io
 import asyncio
+import functools
+import atexit
 import logging
-from typing import List, Dict, Any, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
 import json
 import re
 from urllib.parse import urlparse
 import hashlib
 from pathlib import Path
 
+import aiofiles
 import aiohttp
+import numpy as np
 from bs4 import BeautifulSoup
 import markdown
-from markdownify import markdownify
-from PyPDF2 import PdfReader
+
+try:
+    import orjson
+
+    def json_loads(content: str) -> Any:
+        """Parse JSON with orjson, deferring to the stdlib parser for input orjson rejects (e.g. NaN)."""
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return json.loads(content)
+except ImportError:  # Fall back to the stdlib parser
+    json_loads = json.loads
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # fall back to BeautifulSoup
+    HTMLParser = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # fall back to the pure-Python reader
+    pdfium = None
+    from PyPDF2 import PdfReader
+
+try:
+    from chunker_nb import split_text as split_text_compiled
+except ImportError:  # numba is optional
+    split_text_compiled = None
 
 from rag import get_rag_manager
-from crawler import SimpleCrawl4AITool
+from html_parse import parse_html as _parse_html
+from crawler import SimpleCrawl4AITool, get_crawler_tool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_SENTENCE_ENDINGS = ('.', '!', '?', '\n')
+_VECTORIZE_MIN_CHARS = 4096
+
+def _rfind_break(text: str, start: int, end: int) -> int:
+    """Return the chunk end for the window [start, end), pulled back to a sentence ending if one is near."""
+    # Four C-level rfind calls beat a single regex finditer here, which must walk every match in Python
+    rfind = text.rfind
+    limit = end + 50
+    best_end = end
+    for ending in _SENTENCE_ENDINGS:
+        pos = rfind(ending, start, limit)
+        if pos != -1 and pos > start and pos < best_end:
+            best_end = pos + 1
+    return best_end
+
+def _indexed_break_finder(text: str) -> Callable[[int, int], int]:
+    """Build a `_rfind_break` equivalent for `text` backed by sorted numpy arrays of ending positions."""
+    n = len(text)
+    codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    positions = [np.flatnonzero(codes == ord(ending)) for ending in _SENTENCE_ENDINGS]
+    
+    def find_break(start: int, end: int) -> int:
+        # Normalize the search bounds exactly as str.rfind(ending, start, end + 50) does
+        lo = start if start >= 0 else max(0, start + n)
+        hi = end + 50 if end + 50 >= 0 else max(0, end + 50 + n)
+        hi = min(hi, n)
+        best_end = end
+        for ending_positions in positions:
+            idx = int(np.searchsorted(ending_positions, hi)) - 1
+            if idx >= 0:
+                pos = int(ending_positions[idx])
+                if pos >= lo and pos > start:
+                    best_end = min(best_end, pos + 1)
+        return best_end
+    
+    return find_break
+
+_FILENAME_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9_.-]')
+
+@functools.lru_cache(maxsize=4096)
+def _url_to_filename(url: str) -> str:
+    """Map a URL to the markdown filename its scraped content is saved under."""
+    parsed_url = urlparse(url)
+    filename = _FILENAME_UNSAFE_RE.sub('_', parsed_url.netloc + parsed_url.path)
+    if not filename.endswith(".md"):
+        filename += ".md"
+    return filename
+
+def _markdown_to_text(content: str) -> str:
+    """Render markdown to HTML and return its plain text."""
+    html = markdown.markdown(content)
+    if HTMLParser is None:
+        return BeautifulSoup(html, 'html.parser').get_text()
+    return HTMLParser(html).text()
+
+def _iter_pdf_pages(file_path: str) -> Iterator[str]:
+    """Yield the text of each page of a PDF in order, holding only one page open at a time."""
+    if pdfium is None:
+        for page in PdfReader(file_path).pages:
+            yield page.extract_text()
+        return
+    
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for i in range(len(pdf)):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                yield textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+def _extract_pdf_text(file_path: str) -> str:
+    """Extract the text of every page of a PDF, one page per line block."""
+    buffer = io.StringIO()
+    for text in _iter_pdf_pages(file_path):
+        buffer.write(text)
+        buffer.write("\n")
+    return buffer.getvalue()
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """Return the process-wide pool used for CPU-bound HTML parsing; it is shut down at exit."""
+    global _parse_pool
+    if _parse_pool is None:
+        # Spawned rather than forked: the parent already runs threads (event loops, HTTP clients).
+        # Tasks unpickle from html_parse, not this module, so workers skip the RAG/crawler imports.
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+        )
+        atexit.register(_shutdown_parse_pool)
+    return _parse_pool
+
+def _shutdown_parse_pool() -> None:
+    """Shut down the HTML parsing pool after its pending work."""
+    global _parse_pool
+    pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
 class DocumentIngester:
     """Handles ingestion of various document types into the RAG system."""
     
     def __init__(self):
         """Initialize the document ingester."""
         self.rag_manager = None
+        self._session: Optional[aiohttp.ClientSession] = None
     
-    async def _get_rag_manager(self):
+    def _get_rag_manager(self):
         """Get or create RAG manager instance."""
         if self.rag_manager is None:
-            self.rag_manager = await get_rag_manager()
+            self.rag_manager = get_rag_manager()
         return self.rag_manager
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get or create the pooled HTTP session used for webpage fetches."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=10, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the pooled HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     async def ingest_text(
         self,
         content: str,
@@ -47,7 +201,7 @@ class DocumentIngester:
         metadata: Dict[str, Any] = None
     ) -> str:
         """Ingest plain text content."""
-        rag = await self._get_rag_manager()
+        rag = self._get_rag_manager()
         
         doc_metadata = metadata or {}
         doc_metadata['ingestion_method'] = 'text'
@@ -59,6 +213,25 @@ class DocumentIngester:
             metadata=doc_metadata
         )
     
+    async def ingest_texts(
+        self,
+        contents: List[str],
+        source_type: str = "text",
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ) -> List[str]:
+        """Ingest several plain texts with one batched embedding and insert; returns ids in input order."""
+        rag = self._get_rag_manager()
+        metadatas = metadatas or [None] * len(contents)
+        
+        return await rag.store_documents([
+            {
+                'content': content,
+                'source_type': source_type,
+                'metadata': {**(metadata or {}), 'ingestion_method': 'text'}
+            }
+            for content, metadata in zip(contents, metadatas)
+        ])
+    
     async def ingest_markdown(
         self,
         content: str,
@@ -67,8 +240,7 @@ class DocumentIngester:
     ) -> str:
         """Ingest markdown content."""
         # Convert markdown to plain text for embedding
-        html = markdown.markdown(content)
-        text_content = BeautifulSoup(html, 'html.parser').get_text()
+        text_content = _markdown_to_text(content)
         
         doc_metadata = metadata or {}
         doc_metadata['original_format'] = 'markdown'
@@ -84,47 +256,39 @@ class DocumentIngester:
     async def ingest_webpage(
         self,
         url: str,
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        keep_markdown: bool = False
     ) -> str:
-        """Ingest content from a webpage."""
+        """Ingest content from a webpage.
+        The markdown rendering is only built and stored in metadata when `keep_markdown` is set.
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=30) as response:
-                    if response.status != 200:
-                        raise Exception(f"HTTP {response.status}: {response.reason}")
-                    
-                    html_content = await response.text()
-                    
-                    # Parse HTML
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    
-                    # Get text content
-                    text_content = soup.get_text()
-                    
-                    # Clean up text
-                    lines = (line.strip() for line in text_content.splitlines())
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    text_content = ' '.join(chunk for chunk in chunks if chunk)
-                    
-                    # Convert to markdown for better structure
-                    markdown_content = markdownify(html_content)
-                    
-                    doc_metadata = metadata or {}
-                    doc_metadata['original_format'] = 'html'
-                    doc_metadata['markdown_content'] = markdown_content
-                    doc_metadata['title'] = soup.title.string if soup.title else url
-                    
-                    return await self.ingest_text(
-                        content=text_content,
-                        source_type='webpage',
-                        source_url=url,
-                        metadata=doc_metadata
-                    )
-                    
+            session = await self._get_session()
+            async with session.get(url) as response:
+                if response.status != 200:
+                    raise Exception(f"HTTP {response.status}: {response.reason}")
+                
+                html_content = await response.text()
+            
+            # Parsing is CPU-bound and holds the GIL, so it runs in a worker process
+            loop = asyncio.get_running_loop()
+            text_content, markdown_content, title = await loop.run_in_executor(
+                _get_parse_pool(), _parse_html, html_content, keep_markdown
+            )
+            
+            doc_metadata = metadata or {}
+            doc_metadata['original_format'] = 'html'
+            if markdown_content is not None:
+                doc_metadata['markdown_content'] = markdown_content
+            doc_metadata['title'] = title or url
+            
+            return await self.ingest_text(
+                content=text_content,
+                source_type='webpage',
+                source_url=url,
+                metadata=doc_metadata
+            )
+            
         except Exception as e:
             logger.error(f"Error ingesting webpage {url}: {e}")
             raise
@@ -139,6 +303,15 @@ class DocumentIngester:
         if len(text) <= max_chunk_size:
             return [text]
         
+        # Long texts use the compiled chunker when numba is installed, otherwise
+        # look up sentence endings in a precomputed index instead of rescanning with rfind
+        if len(text) >= _VECTORIZE_MIN_CHARS and split_text_compiled is not None:
+            return split_text_compiled(text, max_chunk_size, overlap)
+        if len(text) < _VECTORIZE_MIN_CHARS:
+            find_break = functools.partial(_rfind_break, text)
+        else:
+            find_break = _indexed_break_finder(text)
+        
         chunks = []
         start = 0
         
@@ -147,16 +320,7 @@ class DocumentIngester:
             
             # Try to break at sentence boundaries
             if end < len(text):
-                # Look for sentence endings
-                sentence_endings = ['.', '!', '?', '\n']
-                best_end = end
-                
-                for ending in sentence_endings:
-                    pos = text.rfind(ending, start, end + 50)
-                    if pos != -1 and pos > start:
-                        best_end = min(best_end, pos + 1)
-                
-                end = best_end
+                end = find_break(start, end)
             
             chunk = text[start:end].strip()
             if chunk:
@@ -179,25 +343,28 @@ class DocumentIngester:
         max_chunk_size: int = 1000,
         overlap: int = 200
     ) -> List[str]:
-        """Ingest large text by splitting into chunks."""
+        """Ingest large text by splitting into chunks.
+        All chunks go through one RAG batch call, which dedupes repeated chunks and batches
+        the embedding and insert requests itself.
+        """
+        rag = self._get_rag_manager()
         chunks = self._split_text_into_chunks(content, max_chunk_size, overlap)
         
-        doc_ids = []
-        base_metadata = metadata or {}
+        # Fields shared by every chunk are merged once; each chunk only adds its own index and size
+        base_metadata = {**(metadata or {}), 'total_chunks': len(chunks), 'ingestion_method': 'text'}
+        documents = [
+            {
+                'content': chunk,
+                'source_type': source_type,
+                'source_url': source_url,
+                'metadata': {**base_metadata, 'chunk_index': i, 'chunk_size': len(chunk)},
+                'chunk_index': i
+            }
+            for i, chunk in enumerate(chunks)
+        ]
         
-        for i, chunk in enumerate(chunks):
-            chunk_metadata = base_metadata.copy()
-            chunk_metadata['chunk_index'] = i
-            chunk_metadata['total_chunks'] = len(chunks)
-            chunk_metadata['chunk_size'] = len(chunk)
-            
-            doc_id = await self.ingest_text(
-                content=chunk,
-                source_type=source_type,
-                source_url=source_url,
-                metadata=chunk_metadata
-            )
-            doc_ids.append(doc_id)
+        # One call, so identical chunks are inserted once rather than racing on the unique document_hash
+        doc_ids = await rag.store_documents(documents)
         
         logger.info(f"Ingested {len(chunks)} chunks for document")
         return doc_ids
@@ -210,7 +377,7 @@ class DocumentIngester:
     ) -> List[str]:
         """Ingest documents from JSON format."""
         try:
-            data = json.loads(json_content)
+            data = json_loads(json_content)
             doc_ids = []
             
             if isinstance(data, list):
@@ -263,34 +430,47 @@ class DocumentIngester:
         if source_type is None:
             source_type = ext.lstrip('.')
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        async with aiofiles.open(file_path, 'rb') as f:
+            raw = await f.read()
+        
+        # Files whose identical bytes were fully ingested before are skipped; their stored ids are returned
+        content_hash = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        rag = self._get_rag_manager()
+        existing_ids = await rag.find_documents_by_content_hash(content_hash)
+        if existing_ids:
+            logger.info(f"Skipping unchanged file {file_path} ({len(existing_ids)} stored documents)")
+            return existing_ids
+        metadata = {**(metadata or {}), 'content_hash': content_hash}
+        
+        # PDFs are read by ingest_pdf itself
+        content = raw.decode('utf-8') if ext != '.pdf' else None
         
         # Handle different file types
         if ext == '.md':
-            return [await self.ingest_markdown(content, source_url=file_path, metadata=metadata)]
+            doc_ids = [await self.ingest_markdown(content, source_url=file_path, metadata=metadata)]
         elif ext == '.json':
-            return await self.ingest_json_documents(content, source_type=source_type, metadata=metadata)
+            doc_ids = await self.ingest_json_documents(content, source_type=source_type, metadata=metadata)
         elif ext == '.pdf':
-            return [await self.ingest_pdf(file_path, source_url=file_path, metadata=metadata)]
+            doc_ids = await self.ingest_pdf(file_path, source_url=file_path, metadata=metadata)
         elif ext in ['.txt', '.py', '.js', '.ts', '.html', '.css']:
-            return [await self.ingest_text(content, source_type=source_type, source_url=file_path, metadata=metadata)]
+            doc_ids = [await self.ingest_text(content, source_type=source_type, source_url=file_path, metadata=metadata)]
         else:
             # Treat as plain text for unknown formats
-            return [await self.ingest_text(content, source_type=source_type, source_url=file_path, metadata=metadata)]
+            doc_ids = [await self.ingest_text(content, source_type=source_type, source_url=file_path, metadata=metadata)]
+        
+        # Only reached when every document was stored; a failed run is retried in full next time
+        await rag.mark_content_ingested(content_hash, source_url=file_path)
+        return doc_ids
 
     async def ingest_pdf(
         self,
         file_path: str,
         source_url: str = None,
         metadata: Dict[str, Any] = None
-    ) -> str:
+    ) -> List[str]:
         """Ingest content from a PDF file."""
         try:
-            reader = PdfReader(file_path)
-            text_content = ""
-            for page in reader.pages:
-                text_content += page.extract_text() + "\n"
+            text_content = await asyncio.to_thread(_extract_pdf_text, file_path)
             
             doc_metadata = metadata or {}
             doc_metadata['original_format'] = 'pdf'
@@ -310,53 +490,54 @@ class DocumentIngester:
         self,
         file_path: str,
         output_dir: str = "source_data/web_markdown",
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        concurrency: int = 8
     ) -> List[str]:
         """
         Reads a list of URLs from a markdown file, scrapes them using crawl4ai,
         saves the content as markdown files, and then ingests them.
+        Up to `concurrency` URLs are scraped and ingested at the same time.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         
-        ingested_doc_ids = []
-        crawl_tool = SimpleCrawl4AITool()
+        crawl_tool = get_crawler_tool(SimpleCrawl4AITool)
+        semaphore = asyncio.Semaphore(concurrency)
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            urls = [line.strip() for line in f if line.strip()]
+        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in (await f.read()).splitlines() if line.strip()]
 
-        for url in urls:
-            try:
-                logger.info(f"Scraping URL: {url}")
-                # Use crawl4ai to scrape the content as markdown
-                scraped_content = crawl_tool.run({"url": url, "extraction_strategy": "markdown"})
-                
-                # Generate a filename from the URL
-                parsed_url = urlparse(url)
-                filename = re.sub(r'[^a-zA-Z0-9_.-]', '_', parsed_url.netloc + parsed_url.path)
-                if not filename.endswith(".md"):
-                    filename += ".md"
-                output_file_path = Path(output_dir) / filename
-
-                with open(output_file_path, 'w', encoding='utf-8') as f:
-                    f.write(scraped_content)
-                logger.info(f"Saved scraped content to {output_file_path}")
-
-                # Ingest the saved markdown file
-                doc_id = await self.ingest_markdown(
-                    content=scraped_content,
-                    source_url=url,
-                    metadata={**(metadata or {}), 'original_file': str(output_file_path)}
-                )
-                ingested_doc_ids.append(doc_id)
-                logger.info(f"Ingested scraped content from {url} with ID: {doc_id}")
+        async def process_url(url: str) -> Optional[str]:
+            async with semaphore:
+                try:
+                    logger.info(f"Scraping URL: {url}")
+                    # Use crawl4ai to scrape the content as markdown
+                    scraped_content = await crawl_tool.arun({"url": url, "extraction_strategy": "markdown"})
+                    
+                    # Generate a filename from the URL
+                    output_file_path = Path(output_dir) / _url_to_filename(url)
 
-            except Exception as e:
-                logger.error(f"Error processing URL {url}: {e}")
-        
-        return ingested_doc_ids
+                    async with aiofiles.open(output_file_path, 'w', encoding='utf-8') as f:
+                        await f.write(scraped_content)
+                    logger.info(f"Saved scraped content to {output_file_path}")
+
+                    # Ingest the saved markdown file
+                    doc_id = await self.ingest_markdown(
+                        content=scraped_content,
+                        source_url=url,
+                        metadata={**(metadata or {}), 'original_file': str(output_file_path)}
+                    )
+                    logger.info(f"Ingested scraped content from {url} with ID: {doc_id}")
+                    return doc_id
+
+                except Exception as e:
+                    logger.error(f"Error processing URL {url}: {e}")
+                    return None
+
+        results = await asyncio.gather(*(process_url(url) for url in urls))
+        return [doc_id for doc_id in results if doc_id is not None]
 
 # Convenience functions for direct use
 async def ingest_text(content: str, **kwargs) -> str:
@@ -367,7 +548,10 @@ async def ingest_text(content: str, **kwargs) -> str:
 async def ingest_webpage(url: str, **kwargs) -> str:
     """Ingest content from a webpage."""
     ingester = DocumentIngester()
-    return await ingester.ingest_webpage(url, **kwargs)
+    try:
+        return await ingester.ingest_webpage(url, **kwargs)
+    finally:
+        await ingester.close()
 
 async def ingest_file(file_path: str, **kwargs) -> List[str]:
     """Ingest content from a local file."""
@@ -4,14 +4,16 @@ from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from agent import create_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
+from agent import create_agent, batch_stream, maybe_fast_path, shutdown_background_loop
 from langchain.callbacks.base import BaseCallbackHandler, AsyncCallbackHandler
 import asyncio
+import json
+from contextlib import asynccontextmanager
+import re
+import aiofiles
 #import os
 from agent import get_captured_figures, clear_captured_figures
-from rag import get_rag_manager
+from rag import get_rag_manager, aclose_rag_manager
 
 #load_dotenv("../.env")
 load_dotenv()
@@ -24,7 +26,15 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the pooled HTTP clients, on this loop and on the agent tools' background loop
+    await aclose_rag_manager()
+    await asyncio.to_thread(shutdown_background_loop)
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -44,7 +54,7 @@ class ChatRequest(BaseModel):
 
 
 @app.post("/chat")
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     # Accept either full messages history or legacy user_input
     messages = None
     if isinstance(req.messages, list) and len(req.messages) > 0:
@@ -54,19 +64,29 @@ def chat(req: ChatRequest):
     else:
         return {"text": "Invalid request: provide 'messages' (list) or 'user_input' (string)."}
 
+    # Plain "search the documents for X" requests skip the agent's LLM planning turn
+    last = messages[-1] if isinstance(messages[-1], dict) else {}
+    if last.get("role") == "user" and isinstance(last.get("content"), str):
+        fast = await asyncio.to_thread(maybe_fast_path, last["content"])
+        if fast is not None:
+            return {"text": fast}
+
     # Basic env checks for required keys depending on model type happen in create_agent
     model = req.model or "gemini-2.5-flash"
     temperature = req.temperature if req.temperature is not None else 0.5
     verbosity = req.verbosity if req.verbosity is not None else 3
 
     try:
-        agent = create_agent(temperature=temperature, model=model, verbosity=verbosity, debug=req.debug)
+        agent = await asyncio.to_thread(
+            create_agent, temperature=temperature, model=model, verbosity=verbosity, debug=req.debug
+        )
     except Exception as e:
         return {"text": f"Server not configured: {e}"}
 
     # Build LangGraph prebuilt chat payload
     payload = {"messages": messages}
-    result = agent.invoke(payload)
+    # The agent makes blocking LLM/tool calls, so run it in a worker thread
+    result = await asyncio.to_thread(agent.invoke, payload)
 
     # Extract clean assistant markdown text
     from typing import Any
@@ -115,19 +135,63 @@ def chat(req: ChatRequest):
     return {"text": text}
 
 
+# Printable ASCII other than '"' and '\\' needs no JSON escaping
+_SSE_SAFE_RE = re.compile(r'[ !#-\[\]-~]*')
+_SSE_DONE = 'data: {"type": "done"}\n\n'
+
+
+def _sse_delta(text: str) -> str:
+    """Format a delta SSE event; same output as json.dumps, without encoding text that needs no escaping."""
+    if _SSE_SAFE_RE.fullmatch(text):
+        return f'data: {{"type": "delta", "text": "{text}"}}\n\n'
+    return f"data: {json.dumps({'type': 'delta', 'text': text})}\n\n"
+
+
+_SSE_QUEUE_SIZE = 1024
+
+
 class SSEQueueHandler(AsyncCallbackHandler):
     def __init__(self, queue: "asyncio.Queue[str]"):
         self.queue = queue
         self.count = 0
+        # Tokens held back while the queue is full, sent later as one item
+        self._pending: list[str] = []
+        # Set once the SSE consumer stops reading; later output is dropped instead of queued
+        self.closed = False
 
     async def on_llm_new_token(self, token: str, **kwargs):  # type: ignore[override]
-        # Forward tokens into async queue for SSE loop
+        # Forward tokens into async queue for SSE loop without ever blocking the LLM run
         self.count += 1
-        await self.queue.put(token)
+        if self.closed:
+            return
+        if self._pending:
+            self._pending.append(token)
+            token = "".join(self._pending)
+        try:
+            self.queue.put_nowait(token)
+            self._pending.clear()
+        except asyncio.QueueFull:
+            self._pending[:] = [token]
+
+    async def _put_eventually(self, item):
+        # The handler runs on the agent thread's loop, so poll rather than await the consumer's queue;
+        # once nobody reads the queue any more, give up so the agent run is never blocked
+        while not self.closed:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                await asyncio.sleep(0.01)
+
+    async def _finish(self):
+        if self._pending:
+            await self._put_eventually("".join(self._pending))
+            self._pending.clear()
+        await self._put_eventually(None)
 
     async def on_llm_end(self, response, **kwargs):  # type: ignore[override]
         # Signal end of stream
-        await self.queue.put(None)
+        await self._finish()
 
     # No-ops to satisfy interface without raising
     async def on_chat_model_start(self, *args, **kwargs): return
@@ -137,7 +201,7 @@ class SSEQueueHandler(AsyncCallbackHandler):
     async def on_llm_start(self, *args, **kwargs): return
     async def on_llm_error(self, *args, **kwargs):
         # Forward error to queue
-        await self.queue.put(None)
+        await self._finish()
     async def on_tool_start(self, *args, **kwargs): return
     async def on_tool_end(self, *args, **kwargs): return
     async def on_tool_error(self, *args, **kwargs): return
@@ -145,14 +209,21 @@ class SSEQueueHandler(AsyncCallbackHandler):
     async def on_agent_action(self, *args, **kwargs): return
     async def on_agent_finish(self, *args, **kwargs): return
 
+# Phrases from thinking_phrases.md, re-read only when the file's mtime changes
+_thinking_cache: dict = {"mtime": None, "phrases": None}
+
 @app.get("/thinking")
 async def thinking():
     import os
     path = os.path.join(os.path.dirname(__file__), "thinking_phrases.md")
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            lines = [ln.strip() for ln in f.read().splitlines() if ln.strip()]
-        return {"phrases": lines}
+        mtime = os.stat(path).st_mtime_ns
+        if _thinking_cache["mtime"] != mtime:
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                data = await f.read()
+            _thinking_cache["phrases"] = [ln.strip() for ln in data.splitlines() if ln.strip()]
+            _thinking_cache["mtime"] = mtime
+        return {"phrases": _thinking_cache["phrases"]}
     except Exception as e:
         return {"phrases": ["Thinking…"], "error": str(e)}
 
@@ -171,46 +242,43 @@ async def chat_stream(req: ChatRequest):
     verbosity = req.verbosity if req.verbosity is not None else 3
 
     async def sse_generator():
-        import json
-        
         # Simple streaming approach for all model types
-        q: asyncio.Queue[str] = asyncio.Queue()
+        q: asyncio.Queue[str] = asyncio.Queue(maxsize=_SSE_QUEUE_SIZE)
         handler = SSEQueueHandler(q)
         
-        # Initialize LLM with streaming support
-        if model.startswith("gemini"):
-            llm = ChatGoogleGenerativeAI(
-                model=model,
-                temperature=temperature,
-                google_api_key=settings.GOOGLE_API_KEY,
-                callbacks=[handler]
-            )
-        else:
-            # OpenAI-compatible models
-            llm = ChatOpenAI(
-                model=model,
-                temperature=temperature,
-                streaming=True,
-                callbacks=[handler],
-                openai_api_key=settings.OPENROUTER_API_KEY,
-                base_url="https://openrouter.ai/api/v1"
-            )
-        
-        # Create agent with streaming LLM
-        agent_local = create_agent(temperature=temperature, model=model, verbosity=verbosity, llm=llm, debug=req.debug)
+        # The streaming LLM is cached; the handler is attached per request via the run config
+        agent_local = await asyncio.to_thread(
+            create_agent, temperature=temperature, model=model, verbosity=verbosity, debug=req.debug, streaming=True
+        )
         
         # Run agent in background
-        task = asyncio.create_task(asyncio.to_thread(agent_local.invoke, {"messages": messages}))
+        task = asyncio.create_task(
+            asyncio.to_thread(agent_local.invoke, {"messages": messages}, {"callbacks": [handler]})
+        )
         
-        # Stream tokens as they arrive
-        while True:
-            try:
-                token = await q.get()
-                if token is None:  # End of stream
+        async def tokens():
+            while True:
+                # Take everything already queued so one wakeup yields one chunk
+                batch = [await q.get()]
+                while batch[-1] is not None and not q.empty():
+                    batch.append(q.get_nowait())
+                finished = batch[-1] is None  # End of stream
+                if finished:
+                    batch.pop()
+                if batch:
+                    yield "".join(batch)
+                if finished:
                     break
-                yield f"data: {json.dumps({'type':'delta','text': token})}\n\n"
-            except Exception:
-                break
+
+        # Stream tokens as they arrive, coalesced into fewer, larger SSE events
+        try:
+            async for text in batch_stream(tokens()):
+                yield _sse_delta(text)
+        except Exception:
+            pass
+        finally:
+            # Reached after the first end-of-stream marker or a client disconnect
+            handler.closed = True
         
         # Wait for task completion
         try:
@@ -218,7 +286,7 @@ async def chat_stream(req: ChatRequest):
         except Exception as e:
             yield f"data: {json.dumps({'type':'error','message': str(e)})}\n\n"
         
-        yield "data: {\"type\": \"done\"}\n\n"
+        yield _SSE_DONE
     
     return StreamingResponse(sse_generator(), media_type="text/event-stream")
 
@@ -229,7 +297,7 @@ async def ingest_file(file: UploadFile = File(...)):
         content = await file.read()
         text_content = content.decode('utf-8')
 
-        rag_manager = await get_rag_manager()
+        rag_manager = get_rag_manager()
         doc_id = await rag_manager.store_document(
             content=text_content,
             metadata={'source': file.filename},
@@ -9,7 +9,8 @@ CREATE TABLE IF NOT EXISTS documents (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
     content TEXT NOT NULL,
     metadata JSONB,
-    embedding vector(768),
+    embedding halfvec(768),
+    embedding_bits bit(768) GENERATED ALWAYS AS (binary_quantize(embedding)::bit(768)) STORED,
     source_type VARCHAR(50),
     source_url TEXT,
     document_hash VARCHAR(64) UNIQUE,
@@ -17,9 +18,52 @@ CREATE TABLE IF NOT EXISTS documents (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Files whose documents were all stored, keyed by the BLAKE2b hash of their bytes;
+-- ingest_file skips a file only once its row exists here
+CREATE TABLE IF NOT EXISTS ingested_files (
+    content_hash VARCHAR(32) PRIMARY KEY,
+    source_url TEXT,
+    completed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Upgrade tables created by earlier versions of this script, so the index below is really built:
+-- convert a vector(768) column to halfvec(768) (fp16, pgvector >= 0.7.0: half the bytes per row to
+-- read during a search, with negligible recall loss), and drop an embedding index that isn't HNSW
+-- (the old ivfflat one has the same name, which would make CREATE INDEX IF NOT EXISTS a no-op)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_attribute a
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = 'documents'::regclass AND a.attname = 'embedding' AND t.typname = 'vector'
+    ) THEN
+        DROP INDEX IF EXISTS documents_embedding_idx;
+        ALTER TABLE documents ALTER COLUMN embedding TYPE halfvec(768) USING embedding::halfvec(768);
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM pg_indexes
+        WHERE indexname = 'documents_embedding_idx' AND indexdef NOT LIKE '%USING hnsw%'
+    ) THEN
+        DROP INDEX documents_embedding_idx;
+    END IF;
+END
+$$;
+
 -- Create indexes for better performance
+-- HNSW (pgvector >= 0.5.0) keeps nearest-neighbour search logarithmic as the table grows,
+-- unlike ivfflat with a fixed number of lists
 CREATE INDEX IF NOT EXISTS documents_embedding_idx 
-ON documents USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+ON documents USING hnsw (embedding halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- One bit per dimension (sign of each component) for a cheap Hamming-distance candidate scan;
+-- tables created before this column existed get it added here
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS embedding_bits bit(768)
+    GENERATED ALWAYS AS (binary_quantize(embedding)::bit(768)) STORED;
+
+CREATE INDEX IF NOT EXISTS documents_embedding_bits_idx
+ON documents USING hnsw (embedding_bits bit_hamming_ops);
 
 CREATE INDEX IF NOT EXISTS documents_source_hash_idx 
 ON documents (document_hash, chunk_index);
@@ -32,8 +76,9 @@ ON documents (created_at DESC);
 
 -- Create a function to search similar documents
 DROP FUNCTION IF EXISTS match_documents(vector, float, int);
+DROP FUNCTION IF EXISTS match_documents(halfvec, float, int);
 CREATE OR REPLACE FUNCTION match_documents (
-    query_embedding vector(768),
+    query_embedding halfvec(768),
     match_threshold float DEFAULT 0.7,
     match_count int DEFAULT 10
 )
@@ -46,22 +91,40 @@ RETURNS TABLE (
     created_at TIMESTAMP WITH TIME ZONE,
     similarity float
 )
-LANGUAGE sql STABLE
+LANGUAGE plpgsql
 AS $$
+DECLARE
+    -- An HNSW scan yields at most hnsw.ef_search rows (pgvector caps it at 1000), so the
+    -- Hamming shortlist is match_count * 40 up to that cap, and ef_search is raised to match
+    shortlist int := LEAST(match_count * 40, 1000);
+BEGIN
+    PERFORM set_config('hnsw.ef_search', shortlist::text, true);
+
+    -- Shortlist by Hamming distance on the binary codes, then rerank the shortlist by exact cosine distance
+    RETURN QUERY
     SELECT
-        documents.id,
-        documents.content,
-        documents.metadata,
-        documents.source_type,
-        documents.source_url,
-        documents.created_at,
-        1 - (documents.embedding <=> query_embedding) as similarity
-    FROM documents
-    WHERE 1 - (documents.embedding <=> query_embedding) > match_threshold
-    ORDER BY documents.embedding <=> query_embedding
+        candidates.id,
+        candidates.content,
+        COALESCE(candidates.metadata, '{}'::jsonb) AS metadata,
+        candidates.source_type,
+        candidates.source_url,
+        candidates.created_at,
+        1 - (candidates.embedding <=> query_embedding) as similarity
+    FROM (
+        SELECT *
+        FROM documents
+        ORDER BY documents.embedding_bits <~> binary_quantize(query_embedding)
+        LIMIT shortlist
+    ) candidates
+    WHERE 1 - (candidates.embedding <=> query_embedding) > match_threshold
+    ORDER BY candidates.embedding <=> query_embedding
     LIMIT match_count;
+END;
 $$;
 
+-- Refresh planner statistics (also worth re-running after large ingestions)
+ANALYZE documents;
+
 -- Test the setup
 SELECT 'RAG database setup completed successfully!' as status;
 
@@ -6,11 +6,44 @@ Provides document storage, retrieval, and semantic search capabilities.
 import os
 import asyncio
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import hashlib
 import json
+import random
+import weakref
 
+import numpy as np
+
+try:
+    import orjson
+
+    def _vector_literal(embedding: List[float]) -> str:
+        """Render an embedding as pgvector text input ('[x,y,...]') using orjson."""
+        return orjson.dumps(embedding).decode()
+
+    # Request bodies and responses of direct PostgREST calls
+    _dumps_json = orjson.dumps
+    _loads_json = orjson.loads
+except ImportError:  # Fall back to the stdlib encoder
+    def _vector_literal(embedding: List[float]) -> str:
+        """Render an embedding as pgvector text input ('[x,y,...]') using the stdlib json module."""
+        return json.dumps(embedding, separators=(',', ':'))
+
+    def _dumps_json(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    _loads_json = json.loads
+
+try:
+    import diskcache
+except ImportError:  # Embeddings are then always requested from Gemini
+    diskcache = None
+
+import httpx
 from supabase import create_client
 import google.generativeai as genai
 
@@ -18,9 +51,152 @@ import google.generativeai as genai
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Hashes per existence lookup: 100 hashes of 64 hex chars make a ~6.5 KB query string,
+# under the 8 KB request-line limit common on nginx-based gateways
+_HASH_LOOKUP_SIZE = 100
+
+# Rows per insert request, keeping request bodies bounded for large ingestions
+_INSERT_BATCH_SIZE = 500
+
+# Cached embeddings are kept for 30 days
+_EMBEDDING_CACHE_TTL = 30 * 86400
+
+class QueryCache:
+    """LRU + TTL cache for search results: exact normalized-query match, then LSH over query embeddings.
+
+    Approximate lookups hash the unit query embedding with random hyperplanes into
+    `n_tables` buckets of `n_bits` each and only compare cosine similarity against
+    entries sharing at least one bucket and the same search parameters.
+    Embeddings live in one preallocated float32 matrix (a row per entry), so
+    candidates are scored with a single matrix-vector product.
+    """
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: float = 300, threshold: float = 0.97,
+                 n_tables: int = 8, n_bits: int = 16):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (matrix row, buckets, results, expires_at)
+        self._tables: List[Dict[int, set]] = [{} for _ in range(n_tables)]
+        # Created on first embedding, once the dimension is known
+        self._planes = None
+        self._matrix = None
+        self._free_rows: List[int] = []
+        self._powers = 1 << np.arange(n_bits, dtype=np.int64)
+        self._stats = {'hits': 0, 'similar_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def key(query: str, *params) -> tuple:
+        """Cache key for `query` searched with `params` (limit, threshold, filters)."""
+        digest = hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+        return (digest, *params)
+
+    def _unit(self, embedding: List[float]) -> "np.ndarray":
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec /= np.linalg.norm(vec) or 1.0
+        return vec
+
+    def _buckets(self, vec: "np.ndarray") -> List[int]:
+        if self._planes is None:
+            rng = np.random.default_rng(0)
+            self._planes = rng.standard_normal((self.n_tables, self.n_bits, vec.shape[0]), dtype=np.float32)
+            self._matrix = np.zeros((self.max_size, vec.shape[0]), dtype=np.float32)
+            self._free_rows = list(range(self.max_size - 1, -1, -1))
+        bits = (self._planes @ vec) > 0
+        return (bits @ self._powers).tolist()
+
+    def get(self, key: tuple):
+        """Return unexpired results cached under exactly `key`, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] <= time.monotonic():
+                self._evict(key)
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[2]
+
+    def get_similar(self, embedding: List[float], params: tuple):
+        """Return unexpired results for a near-duplicate query searched with the same `params`, else None."""
+        vec = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for table, bucket in zip(self._tables, self._buckets(vec)):
+                candidates.update(table.get(bucket, ()))
+            keys = []
+            for key in candidates:
+                if key[1:] != params:
+                    continue
+                if self._entries[key][3] <= now:
+                    self._evict(key)
+                    continue
+                keys.append(key)
+            best_key = None
+            if keys:
+                scores = self._matrix[[self._entries[key][0] for key in keys]] @ vec
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    best_key = keys[best]
+            if best_key is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats['similar_hits'] += 1
+            return self._entries[best_key][2]
+
+    def put(self, key: tuple, embedding: List[float], results) -> None:
+        vec = self._unit(embedding)
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            buckets = self._buckets(vec)
+            while len(self._entries) >= self.max_size:
+                self._evict(next(iter(self._entries)))
+            row = self._free_rows.pop()
+            self._matrix[row] = vec
+            for table, bucket in zip(self._tables, buckets):
+                table.setdefault(bucket, set()).add(key)
+            self._entries[key] = (row, buckets, results, time.monotonic() + self.ttl_seconds)
+
+    def _evict(self, key: tuple) -> None:
+        row, buckets, _, _ = self._entries.pop(key)
+        self._free_rows.append(row)
+        for table, bucket in zip(self._tables, buckets):
+            members = table.get(bucket)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del table[bucket]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+            if self._matrix is not None:
+                self._free_rows = list(range(self.max_size - 1, -1, -1))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['similar_hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] + self._stats['similar_hits']) / lookups if lookups else 0.0
+            return {**self._stats, 'size': len(self._entries), 'hit_rate': hit_rate}
+
 class RAGManager:
     """Manages RAG operations including document storage and retrieval."""
     
+    __slots__ = (
+        'supabase_url', 'supabase_key', 'gemini_api_key', 'embedding_model', 'supabase',
+        '_docs_table', '_embed_kwargs', '_embed_semaphores', '_embedding_cache', '_query_cache',
+        '_http_clients',
+    )
+    
     def __init__(self):
         """Initialize RAG manager with Supabase and Google Gemini clients."""
         self.supabase_url = os.getenv('VITE_SUPABASE_URL')
@@ -33,19 +209,102 @@ class RAGManager:
         
         self.supabase = create_client(self.supabase_url, self.supabase_key)
         genai.configure(api_key=self.gemini_api_key)
+        
+        # The table request builder is stateless (each query method returns a new builder), so one is reused
+        self._docs_table = self.supabase.table('documents')
+        self._embed_kwargs = {'model': self.embedding_model, 'task_type': "RETRIEVAL_DOCUMENT"}
+        
+        # Bound embedding batch requests in flight across concurrent ingestions; an asyncio.Semaphore
+        # binds to one loop, so each event loop using this manager gets its own
+        self._embed_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        
+        # On-disk embeddings keyed by model + text, so re-ingested chunks are not embedded again
+        self._embedding_cache = None
+        if diskcache is not None:
+            self._embedding_cache = diskcache.Cache(os.getenv('EMBEDDING_CACHE_DIR', '.embedding_cache'))
+        
+        # Recent search results, dropped whenever documents are added or deleted
+        self._query_cache = QueryCache()
+        
+        # Pooled HTTP/2 clients for direct PostgREST calls, one per event loop using this manager
+        self._http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+    
+    def _get_embed_semaphore(self) -> asyncio.Semaphore:
+        """Return the running loop's semaphore bounding concurrent embedding requests."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._embed_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._embed_semaphores.setdefault(loop, asyncio.Semaphore(5))
+        return semaphore
+    
+    def _get_http(self) -> httpx.AsyncClient:
+        """Return the running loop's HTTP/2 client, keeping TLS connections warm across requests."""
+        loop = asyncio.get_running_loop()
+        client = self._http_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=f"{self.supabase_url}/rest/v1",
+                headers={
+                    'apikey': self.supabase_key,
+                    'Authorization': f'Bearer {self.supabase_key}',
+                    'Content-Type': 'application/json',
+                },
+                http2=True,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                timeout=30.0,
+            )
+            self._http_clients[loop] = client
+        return client
+    
+    async def aclose(self) -> None:
+        """Close the running loop's HTTP client."""
+        client = self._http_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counts and size of the search result cache."""
+        return self._query_cache.stats()
+    
+    def _embedding_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.embedding_model}\n{text}".encode()).hexdigest()
+    
+    def _cache_embedding(self, text: str, embedding: List[float]) -> None:
+        if self._embedding_cache is not None:
+            self._embedding_cache.set(self._embedding_key(text), embedding, expire=_EMBEDDING_CACHE_TTL)
+    
+    def _cache_embeddings(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        for text, embedding in zip(texts, embeddings):
+            self._cache_embedding(text, embedding)
+    
+    def _cached_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if self._embedding_cache is None:
+            return [None] * len(texts)
+        return [self._embedding_cache.get(self._embedding_key(text)) for text in texts]
     
     async def create_embedding(self, text: str) -> List[float]:
         """Create an embedding for the given text using Google Gemini."""
+        # Disk cache and Supabase calls block, so they run in worker threads rather than stall the loop
+        if self._embedding_cache is not None:
+            cached = await asyncio.to_thread(self._embedding_cache.get, self._embedding_key(text))
+            if cached is not None:
+                return cached
+        
         try:
-            # Use Google Gemini embeddings
-            result = genai.embed_content(
-                model=self.embedding_model,
+            # Use Google Gemini embeddings; the client call blocks, so it runs in a worker thread
+            result = await asyncio.to_thread(
+                genai.embed_content,
                 content=text,
-                task_type="RETRIEVAL_DOCUMENT",
+                **self._embed_kwargs,
             )
             
             # Gemini returns the embedding directly
             if 'embedding' in result:
+                await asyncio.to_thread(self._cache_embedding, text, result['embedding'])
                 return result['embedding']
             else:
                 logger.error(f"Unexpected Gemini response format: {result}")
@@ -55,8 +314,53 @@ class RAGManager:
             logger.error(f"Error creating embedding with Gemini: {e}")
             raise
     
+    async def create_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+        """Create embeddings for several texts, `batch_size` per Gemini request; returns them in input order.
+        Batches are sent concurrently, bounded by the running loop's embedding semaphore.
+        """
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with self._get_embed_semaphore():
+                # Small jitter so concurrent batches don't hit the API in lockstep (429s)
+                await asyncio.sleep(random.uniform(0, 0.05))
+                # A list of contents is sent as one batchEmbedContents request
+                result = await asyncio.to_thread(
+                    genai.embed_content,
+                    content=batch,
+                    **self._embed_kwargs,
+                )
+            
+            if 'embedding' not in result or len(result['embedding']) != len(batch):
+                logger.error(f"Unexpected Gemini batch response format: {result}")
+                raise ValueError("Unexpected response format from Gemini API")
+            return result['embedding']
+        
+        embeddings = await asyncio.to_thread(self._cached_embeddings, texts)
+        # Only texts without a cached embedding are sent to Gemini
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        try:
+            batches = await asyncio.gather(*(
+                embed_batch([texts[i] for i in missing[j:j + batch_size]])
+                for j in range(0, len(missing), batch_size)
+            ))
+            fresh = [embedding for batch in batches for embedding in batch]
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+            if fresh:
+                await asyncio.to_thread(self._cache_embeddings, [texts[i] for i in missing], fresh)
+            return embeddings
+                
+        except Exception as e:
+            logger.error(f"Error creating embeddings with Gemini: {e}")
+            raise
+    
     def _generate_document_hash(self, content: str, source_url: str = "") -> str:
-        """Generate a unique hash for a document."""
+        """Generate a unique hash for a document (64 hex chars, fits document_hash VARCHAR(64))."""
+        content_to_hash = f"{content}{source_url}"
+        return hashlib.blake2b(content_to_hash.encode(), digest_size=32).hexdigest()
+    
+    def _generate_legacy_document_hash(self, content: str, source_url: str = "") -> str:
+        """SHA-256 hash that rows stored before the switch to BLAKE2b carry."""
         content_to_hash = f"{content}{source_url}"
         return hashlib.sha256(content_to_hash.encode()).hexdigest()
     
@@ -69,41 +373,100 @@ class RAGManager:
         chunk_index: int = 0
     ) -> str:
         """Store a document in the database."""
+        doc_ids = await self.store_documents([{
+            'content': content,
+            'metadata': metadata,
+            'source_type': source_type,
+            'source_url': source_url,
+            'chunk_index': chunk_index
+        }])
+        return doc_ids[0]
+    
+    async def store_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """Store several documents, embedding them in batched requests and inserting new rows in one request.
+        Each item takes the same keys as `store_document` arguments, plus an optional precomputed
+        'embedding'; returns ids in input order.
+        """
         try:
-            # Generate document hash
-            document_hash = self._generate_document_hash(content, source_url or "")
-            
-            # Check if document already exists
-            existing = self.supabase.table('documents').select('id').eq('document_hash', document_hash).execute()
-            if existing.data:
-                logger.info(f"Document already exists: {document_hash}")
-                return existing.data[0]['id']
-            
-            # Create embedding
-            embedding = await self.create_embedding(content)
-            
-            # Store document
-            document_data = {
-                'content': content,
-                'metadata': metadata or {},
-                'embedding': embedding,
-                'source_type': source_type,
-                'source_url': source_url,
-                'document_hash': document_hash,
-                'chunk_index': chunk_index
+            doc_ids: List[Optional[str]] = [None] * len(documents)
+            new_rows: Dict[str, Dict[str, Any]] = {}  # document_hash -> row to insert
+            positions: Dict[str, List[int]] = {}  # document_hash -> input indices, so repeats are inserted once
+            
+            # Generate document hashes
+            hashes = [self._generate_document_hash(doc['content'], doc.get('source_url') or "") for doc in documents]
+            
+            # Rows stored before the BLAKE2b switch are matched through their SHA-256 hash
+            legacy_hashes = {
+                self._generate_legacy_document_hash(doc['content'], doc.get('source_url') or ""): document_hash
+                for doc, document_hash in zip(documents, hashes)
             }
             
-            result = self.supabase.table('documents').insert(document_data).execute()
+            # Check which documents already exist, one IN query per group of hashes
+            existing_ids: Dict[str, str] = {}
+            lookup_hashes = list(dict.fromkeys(hashes)) + list(legacy_hashes)
+            for j in range(0, len(lookup_hashes), _HASH_LOOKUP_SIZE):
+                existing = await asyncio.to_thread(
+                    self._docs_table
+                    .select('id, document_hash')
+                    .in_('document_hash', lookup_hashes[j:j + _HASH_LOOKUP_SIZE])
+                    .execute
+                )
+                for row in existing.data:
+                    document_hash = legacy_hashes.get(row['document_hash'], row['document_hash'])
+                    existing_ids.setdefault(document_hash, row['id'])
             
-            if result.data:
-                doc_id = result.data[0]['id']
-                logger.info(f"Document stored successfully: {doc_id}")
-                return doc_id
-            else:
-                raise Exception("No data returned from insert")
+            for i, (doc, document_hash) in enumerate(zip(documents, hashes)):
+                if document_hash in existing_ids:
+                    logger.info(f"Document already exists: {document_hash}")
+                    doc_ids[i] = existing_ids[document_hash]
+                    continue
+                if document_hash in positions:
+                    positions[document_hash].append(i)
+                    continue
+                
+                positions[document_hash] = [i]
+                new_rows[document_hash] = {
+                    'content': doc['content'],
+                    'metadata': doc.get('metadata') or {},
+                    'source_type': doc.get('source_type', 'text'),
+                    'source_url': doc.get('source_url'),
+                    'document_hash': document_hash,
+                    'chunk_index': doc.get('chunk_index', 0),
+                    'embedding': doc.get('embedding')
+                }
+            
+            if new_rows:
+                # Create embeddings for the rows that don't bring their own
+                rows = list(new_rows.values())
+                to_embed = [row for row in rows if row['embedding'] is None]
+                if to_embed:
+                    embeddings = await self.create_embeddings_batch([row['content'] for row in to_embed])
+                    for row, embedding in zip(to_embed, embeddings):
+                        row['embedding'] = embedding
+                for row in rows:
+                    # Pre-rendered so the client's stdlib JSON encoder writes one string, not every float
+                    row['embedding'] = _vector_literal(row['embedding'])
+                
+                # Store documents, one insert request per `_INSERT_BATCH_SIZE` rows
+                stored = 0
+                for j in range(0, len(rows), _INSERT_BATCH_SIZE):
+                    result = await asyncio.to_thread(self._docs_table.insert(rows[j:j + _INSERT_BATCH_SIZE]).execute)
+                    if not result.data:
+                        raise Exception("No data returned from insert")
+                    
+                    for row in result.data:
+                        for i in positions.get(row['document_hash'], ()):
+                            doc_ids[i] = row['id']
+                    stored += len(result.data)
+                logger.info(f"Stored {stored} documents")
+                
+                # New content may change search results
+                self._query_cache.clear()
+            
+            return doc_ids
                 
         except Exception as e:
-            logger.error(f"Error storing document: {e}")
+            logger.error(f"Error storing documents: {e}")
             raise
     
     async def search_documents(
@@ -111,56 +474,49 @@ class RAGManager:
         query: str,
         limit: int = 5,
         threshold: float = 0.7,
-        source_type: str = None
+        source_type: str = None,
+        query_embedding: List[float] = None
     ) -> List[Dict[str, Any]]:
-        """Search for relevant documents using semantic similarity."""
+        """Search for relevant documents using semantic similarity.
+        A precomputed `query_embedding` may be passed to skip re-embedding the query.
+        Results are cached for repeated and near-duplicate queries.
+        """
         try:
-            # Create embedding for the query
-            query_embedding = await self.create_embedding(query)
+            params = (limit, threshold, source_type)
+            cache_key = self._query_cache.key(query, *params)
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            # Build the SQL query
-            sql_query = """
-            SELECT id, content, metadata, source_type, source_url, created_at,
-                   1 - (embedding <=> %s::vector) as similarity
-            FROM documents
-            WHERE 1 - (embedding <=> %s::vector) > %s
-            """
+            # Create embedding for the query
+            if query_embedding is None:
+                query_embedding = await self.create_embedding(query)
             
-            params = [str(query_embedding), str(query_embedding), threshold]
+            cached = self._query_cache.get_similar(query_embedding, params)
+            if cached is not None:
+                self._query_cache.put(cache_key, query_embedding, cached)
+                return cached
             
-            if source_type:
-                sql_query += " AND source_type = %s"
-                params.append(source_type)
-            
-            sql_query += " ORDER BY embedding <=> %s::vector LIMIT %s"
-            params.extend([str(query_embedding), limit])
-            
-            # Use the built-in vector similarity search
-            query_embedding_str = str(query_embedding)
-            result = self.supabase.rpc(
-                'match_documents',
-                {
-                    'query_embedding': query_embedding_str,
+            # Use the built-in vector similarity search; the embedding is rendered once
+            # as pgvector text input by orjson rather than float by float by the stdlib encoder
+            # The RPC goes over the pooled async HTTP/2 client, so it doesn't block the event loop
+            response = await self._get_http().post(
+                '/rpc/match_documents',
+                content=_dumps_json({
+                    'query_embedding': _vector_literal(query_embedding),
                     'match_threshold': threshold,
                     'match_count': limit
-                }
-            ).execute()
+                })
+            )
+            response.raise_for_status()
             
-            if result.data:
-                documents = []
-                for row in result.data:
-                    documents.append({
-                        'id': row['id'],
-                        'content': row['content'],
-                        'metadata': row['metadata'] if row['metadata'] else {},
-                        'source_type': row['source_type'],
-                        'source_url': row['source_url'],
-                        'created_at': row['created_at'],
-                        'similarity': float(row['similarity'])
-                    })
-                return documents
-            else:
-                return []
+            # match_documents returns exactly the result fields, already filtered and ordered
+            documents = [
+                {**row, 'metadata': row['metadata'] or {}, 'similarity': float(row['similarity'])}
+                for row in _loads_json(response.content) or ()
+            ]
+            self._query_cache.put(cache_key, query_embedding, documents)
+            return documents
                 
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
@@ -169,7 +525,7 @@ class RAGManager:
     async def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a specific document by ID."""
         try:
-            result = self.supabase.table('documents').select('*').eq('id', document_id).execute()
+            result = await asyncio.to_thread(self._docs_table.select('*').eq('id', document_id).execute)
             if result.data:
                 doc = result.data[0]
                 doc['metadata'] = doc['metadata'] if doc['metadata'] else {}
@@ -179,10 +535,50 @@ class RAGManager:
             logger.error(f"Error retrieving document: {e}")
             raise
     
+    async def find_documents_by_content_hash(self, content_hash: str) -> List[str]:
+        """Return the ids of documents ingested from a source whose metadata content_hash matches.
+        Only sources recorded in ingested_files count, so a partly failed ingestion is not treated as done.
+        """
+        try:
+            completed = await asyncio.to_thread(
+                self.supabase.table('ingested_files')
+                .select('content_hash')
+                .eq('content_hash', content_hash)
+                .execute
+            )
+            if not completed.data:
+                return []
+            
+            result = await asyncio.to_thread(
+                self._docs_table
+                .select('id')
+                .eq('metadata->>content_hash', content_hash)
+                .order('chunk_index')
+                .order('created_at')
+                .execute
+            )
+            return [row['id'] for row in result.data]
+        except Exception as e:
+            logger.error(f"Error looking up content hash: {e}")
+            raise
+    
+    async def mark_content_ingested(self, content_hash: str, source_url: str = None) -> None:
+        """Record that every document for this source content was stored."""
+        try:
+            await asyncio.to_thread(
+                self.supabase.table('ingested_files').upsert(
+                    {'content_hash': content_hash, 'source_url': source_url}
+                ).execute
+            )
+        except Exception as e:
+            logger.error(f"Error recording ingested content: {e}")
+            raise
+    
     async def delete_document(self, document_id: str) -> bool:
         """Delete a document by ID."""
         try:
-            result = self.supabase.table('documents').delete().eq('id', document_id).execute()
+            result = await asyncio.to_thread(self._docs_table.delete().eq('id', document_id).execute)
+            self._query_cache.clear()
             return bool(result.data)
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
@@ -196,14 +592,14 @@ class RAGManager:
     ) -> List[Dict[str, Any]]:
         """List documents with optional filtering."""
         try:
-            query = self.supabase.table('documents').select('id, content, metadata, source_type, source_url, created_at')
+            query = self._docs_table.select('id, content, metadata, source_type, source_url, created_at')
             
             if source_type:
                 query = query.eq('source_type', source_type)
             
             query = query.order('created_at', desc=True).range(offset, offset + limit - 1)
             
-            result = query.execute()
+            result = await asyncio.to_thread(query.execute)
             
             documents = []
             for doc in result.data:
@@ -218,26 +614,44 @@ class RAGManager:
 
 # Global RAG manager instance
 _rag_manager = None
+_rag_manager_lock = threading.Lock()
 
-async def get_rag_manager() -> RAGManager:
-    """Get the global RAG manager instance."""
+def get_rag_manager() -> RAGManager:
+    """Get the global RAG manager instance (created on first use; no I/O, so this is a plain function)."""
     global _rag_manager
     if _rag_manager is None:
-        _rag_manager = RAGManager()
+        with _rag_manager_lock:
+            if _rag_manager is None:
+                _rag_manager = RAGManager()
     return _rag_manager
 
+async def aclose_rag_manager() -> None:
+    """Close the running loop's pooled HTTP client, if a RAG manager was ever created."""
+    if _rag_manager is not None:
+        await _rag_manager.aclose()
+
 # Tool functions for agent integration
-async def search_documents_tool(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+async def search_documents_tool(query: str, limit: int = 5, query_embedding: List[float] = None) -> List[Dict[str, Any]]:
     """Tool function to search documents."""
-    rag = await get_rag_manager()
-    return await rag.search_documents(query, limit=limit)
+    rag = get_rag_manager()
+    return await rag.search_documents(query, limit=limit, query_embedding=query_embedding)
+
+async def embed_query_tool(query: str) -> List[float]:
+    """Tool function to embed a query string."""
+    rag = get_rag_manager()
+    return await rag.create_embedding(query)
+
+async def batch_search_documents_tool(queries: List[str], limit: int = 5) -> List[List[Dict[str, Any]]]:
+    """Tool function to run several document searches concurrently."""
+    rag = get_rag_manager()
+    return list(await asyncio.gather(*(rag.search_documents(q, limit=limit) for q in queries)))
 
 async def store_document_tool(content: str, metadata: Dict[str, Any] = None) -> str:
     """Tool function to store a document."""
-    rag = await get_rag_manager()
+    rag = get_rag_manager()
     return await rag.store_document(content, metadata=metadata)
 
 async def get_document_tool(document_id: str) -> Optional[Dict[str, Any]]:
     """Tool function to get a document by ID."""
-    rag = await get_rag_manager()
+    rag = get_rag_manager()
     return await rag.get_document_by_id(document_id)
\ No newline at end of file
@@ -1,14 +1,26 @@
 import asyncio
 import os
+import re
 import logging
-from pathlib import Path
+from typing import List
 from ingestion import DocumentIngester
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def main():
+_PDF_NAME_RE = re.compile(r"\.pdf$", re.IGNORECASE)
+
+def _find_pdfs(directory: str) -> List[os.DirEntry]:
+    """Return the PDF files directly inside `directory`, sorted by name; a missing directory has none."""
+    try:
+        with os.scandir(directory) as entries:
+            pdfs = [entry for entry in entries if _PDF_NAME_RE.search(entry.name) and entry.is_file()]
+    except FileNotFoundError:
+        return []
+    return sorted(pdfs, key=lambda entry: entry.name)
+
+async def main(max_concurrent_pdfs: int = 8):
     """Orchestrates the ingestion of PDF files and web content."""
     ingester = DocumentIngester()
     
@@ -26,20 +38,30 @@ async def main():
 
     # Ingest PDF files
     pdf_dir = "source_data/pdf"
-    if os.path.exists(pdf_dir) and os.listdir(pdf_dir):
+    pdf_entries = _find_pdfs(pdf_dir)
+    if pdf_entries:
         logger.info(f"Ingesting PDF files from {pdf_dir}...")
-        for filename in os.listdir(pdf_dir):
-            if filename.lower().endswith(".pdf"):
-                stats["pdf_files_processed"] += 1
-                file_path = Path(pdf_dir) / filename
+        stats["pdf_files_processed"] = len(pdf_entries)
+        # Several PDFs are ingested at once so their embedding/storage round-trips overlap
+        semaphore = asyncio.Semaphore(max_concurrent_pdfs)
+
+        async def ingest_one(entry: os.DirEntry):
+            async with semaphore:
                 try:
-                    doc_id = await ingester.ingest_pdf(str(file_path))
-                    logger.info(f"Successfully ingested PDF: {filename} with ID: {doc_id}")
-                    stats["pdf_files_success"] += 1
-                    stats["pdf_files"].append({"filename": filename, "id": doc_id})
+                    return entry, await ingester.ingest_pdf(entry.path), None
                 except Exception as e:
-                    logger.error(f"Failed to ingest PDF {filename}: {e}")
-                    stats["pdf_files_failed"] += 1
+                    return entry, None, e
+
+        # Stats and logs are updated as each PDF finishes
+        for next_done in asyncio.as_completed([ingest_one(entry) for entry in pdf_entries]):
+            entry, doc_id, error = await next_done
+            if error is None:
+                logger.info(f"Successfully ingested PDF: {entry.name} with ID: {doc_id}")
+                stats["pdf_files_success"] += 1
+                stats["pdf_files"].append({"filename": entry.name, "id": doc_id})
+            else:
+                logger.error(f"Failed to ingest PDF {entry.name}: {error}")
+                stats["pdf_files_failed"] += 1
     else:
         logger.info(f"No PDF files found in {pdf_dir} or directory does not exist. Skipping PDF ingestion.")
 
@@ -81,6 +103,8 @@ async def main():
         for website in stats['websites']:
             logger.info(f"  - {website['url']} (ID: {website['id']})")
     
+    await ingester.close()
+
     logger.info("=" * 50)
     logger.info("Ingestion process completed successfully.")
     logger.info("=" * 50)
@@ -7,20 +7,125 @@ import os
 import sys
 import asyncio
 from pathlib import Path
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+# Errors raised by the supabase-py and Gemini clients, when installed
+try:
+    from postgrest.exceptions import APIError
+except ImportError:
+    APIError = None
+try:
+    from google.api_core import exceptions as google_exceptions
+    _GOOGLE_TRANSIENT = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+except ImportError:
+    _GOOGLE_TRANSIENT = ()
+
+try:
+    import uvloop
+    # libuv's loop has cheaper per-await wakeups for the suite's many small HTTPS calls
+    _new_event_loop = uvloop.new_event_loop
+except ImportError:  # Fall back to the default asyncio loop
+    _new_event_loop = asyncio.new_event_loop
 
 # Add the server directory to the path
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Load environment variables
-from dotenv import load_dotenv
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
+# Load environment variables, unless a parent process (e.g. a CI loop rerunning the suite) already did
+if not os.environ.get('_ESI_ENV_LOADED'):
+    from dotenv import load_dotenv
+    env_path = Path(__file__).parent.parent / '.env'
+    load_dotenv(env_path)
+    os.environ['_ESI_ENV_LOADED'] = '1'
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# WARNING by default, so a run prints one timing line per test plus failures (LOG_LEVEL=INFO for details).
+# Records go through a queue and a listener thread does the stderr writes, off the event loop.
+class SectionFormatter(logging.Formatter):
+    """Start records logged with extra=_SECTION on a new paragraph, only when stderr is a terminal."""
+    
+    blank_lines = sys.stderr.isatty()
+    
+    def format(self, record):
+        text = super().format(record)
+        if self.blank_lines and getattr(record, 'section_start', False):
+            return "\n" + text
+        return text
+
+_SECTION = {'section_start': True}
+
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(SectionFormatter('%(message)s'))
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'), handlers=[_queue_handler])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Documents pushed through the pipeline test, and the rate it must sustain
+_PIPELINE_DOCS = 128
+_MIN_PIPELINE_DOCS_PER_SEC = 5.0
+
+def _is_transient(e: Exception) -> bool:
+    """Timeouts, dropped connections and 429/5xx responses are worth another attempt."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    if APIError is not None and isinstance(e, APIError):
+        # Non-JSON gateway errors carry the HTTP status as the code; PostgreSQL errors carry SQLSTATEs
+        code = str(getattr(e, 'code', '') or '')
+        return code == '429' or (len(code) == 3 and code.startswith('5') and code.isdigit())
+    return isinstance(e, (httpx.TransportError, TimeoutError) + _GOOGLE_TRANSIENT)
+
+async def _retry(coro_fn, tries: int = 3, base: float = 0.2):
+    """Await `coro_fn()`, retrying transient errors with exponential backoff plus jitter."""
+    for attempt in range(tries):
+        try:
+            return await coro_fn()
+        except Exception as e:
+            if attempt == tries - 1 or not _is_transient(e):
+                raise
+            delay = base * 2 ** attempt + random.random() * 0.1
+            logger.warning("   Transient error (%s), retrying in %.2fs", e, delay)
+            await asyncio.sleep(delay)
+
+def _load_rag_manager():
+    from rag import get_rag_manager
+    return get_rag_manager()
+
+# Client imports and Supabase/Gemini setup start in the background at import,
+# overlapping with the suite's startup and the first tests
+_rag_preload = ThreadPoolExecutor(max_workers=1).submit(_load_rag_manager)
+
+# Shared across tests so the Supabase client and HTTP session are set up once
+_ingester = None
+
+async def get_rag():
+    """Return the process-wide RAG manager once the background preload has finished."""
+    return await asyncio.wrap_future(_rag_preload)
+
+async def get_ingester():
+    """Return the DocumentIngester shared by the tests, reusing the preloaded RAG manager."""
+    global _ingester
+    if _ingester is None:
+        from ingestion import DocumentIngester
+        _ingester = DocumentIngester()
+        _ingester.rag_manager = await get_rag()
+    return _ingester
+
 def test_environment():
     """Test if environment variables are set correctly."""
     logger.info("Testing environment variables...")
@@ -37,8 +142,8 @@ def test_environment():
         return False
     
     logger.info("✅ Environment variables found")
-    logger.info(f"   URL: {supabase_url[:20]}...")
-    logger.info(f"   Key: {supabase_key[:10]}...")
+    logger.info("   URL: %.20s...", supabase_url)
+    logger.info("   Key: %.10s...", supabase_key)
     return True
 
 def test_database_connection():
@@ -46,16 +151,16 @@ def test_database_connection():
     logger.info("Testing database connection...")
     
     try:
-        from rag import RAGManager
-        rag = RAGManager()
+        # Runs in a worker thread, so it can block on the preload directly
+        rag = _rag_preload.result()
         
-        # Test basic connection
-        result = rag.supabase.table('documents').select('count').execute()
-        logger.info("✅ Database connection successful")
+        # Test basic connection; with no columns, postgrest sends a HEAD request and only the count header comes back
+        result = rag.supabase.table('documents').select(count='exact').execute()
+        logger.info("✅ Database connection successful (%s documents)", result.count)
         return True
         
     except Exception as e:
-        logger.error(f"❌ Database connection failed: {e}")
+        logger.error("❌ Database connection failed: %s", e)
         return False
 
 async def test_document_ingestion():
@@ -63,26 +168,28 @@ async def test_document_ingestion():
     logger.info("Testing document ingestion...")
     
     try:
-        from ingestion import DocumentIngester
-        ingestion = DocumentIngester()
+        ingestion = await get_ingester()
         
-        # Test with a simple text
-        test_content = "This is a test document for RAG integration testing."
-        doc_id = await ingestion.ingest_text(
-            content=test_content,
+        # Test with a batch of simple texts, embedded and inserted together
+        test_contents = [
+            f"This is test document {i} for RAG integration testing." for i in range(16)
+        ]
+        # Re-storing is safe: documents are deduplicated by content hash
+        doc_ids = await _retry(lambda: ingestion.ingest_texts(
+            contents=test_contents,
             source_type="test",
-            metadata={"test": True}
-        )
+            metadatas=[{"test": True}] * len(test_contents)
+        ))
         
-        if doc_id:
-            logger.info(f"✅ Document ingestion successful: {doc_id}")
+        if doc_ids and all(doc_ids):
+            logger.info("✅ Document ingestion successful: %d documents", len(doc_ids))
             return True
         else:
             logger.error("❌ Document ingestion failed")
             return False
             
     except Exception as e:
-        logger.error(f"❌ Document ingestion failed: {e}")
+        logger.error("❌ Document ingestion failed: %s", e)
         return False
 
 async def test_document_search():
@@ -90,26 +197,25 @@ async def test_document_search():
     logger.info("Testing document search...")
     
     try:
-        from rag import RAGManager
-        rag = RAGManager()
+        rag = await get_rag()
         
-        # Search for the test document
-        results = await rag.search_documents(
+        # Search for the test document; match_count is passed to the RPC, so only the displayed rows come back
+        results = await _retry(lambda: rag.search_documents(
             query="test document",
-            limit=5
-        )
+            limit=2
+        ))
         
         if results:
-            logger.info(f"✅ Document search successful: found {len(results)} results")
-            for i, result in enumerate(results[:2]):
-                logger.info(f"   Result {i+1}: {result['content'][:50]}...")
+            logger.info("✅ Document search successful: found %d results", len(results))
+            for i, result in enumerate(results):
+                logger.info("   Result %d: %.50s...", i + 1, result['content'])
             return True
         else:
             logger.warning("⚠️  No search results found")
             return True  # This might be OK if no documents exist
             
     except Exception as e:
-        logger.error(f"❌ Document search failed: {e}")
+        logger.error("❌ Document search failed: %s", e)
         return False
 
 async def test_agent_integration():
@@ -119,17 +225,22 @@ async def test_agent_integration():
     try:
         from agent import search_documents, store_document, get_document_info
         
-        # Test search_documents function
-        results = await search_documents("test")
-        logger.info("✅ search_documents function accessible")
+        # search_documents and store_document are independent; only get_document_info waits for the store
+        search_results, doc_id = await asyncio.gather(
+            _retry(lambda: search_documents("test")),
+            _retry(lambda: store_document(content="Test content", metadata={"source_type": "test", "test": True})),
+        )
+        if not isinstance(search_results, list):
+            logger.error("❌ search_documents returned %s, expected a list", type(search_results).__name__)
+            return False
+        logger.info("✅ search_documents function accessible (%d results)", len(search_results))
         
         # Test store_document function
-        doc_id = await store_document(content="Test content", metadata={"source_type": "test", "test": True})
         if doc_id:
-            logger.info(f"✅ store_document function working: {doc_id}")
+            logger.info("✅ store_document function working: %s", doc_id)
             
             # Test get_document_info
-            info = await get_document_info(doc_id)
+            info = await _retry(lambda: get_document_info(doc_id))
             if info:
                 logger.info("✅ get_document_info function working")
                 return True
@@ -137,71 +248,160 @@ async def test_agent_integration():
         return False
         
     except Exception as e:
-        logger.error(f"❌ Agent integration failed: {e}")
+        logger.error("❌ Agent integration failed: %s", e)
         return False
 
-async def run_async_tests():
-    """Run async tests."""
-    async_tests = [
-        ("Document Ingestion", test_document_ingestion),
-        ("Document Search", test_document_search),
-        ("Agent Integration", test_agent_integration),
+def _drain(q: asyncio.Queue, first, max_items: int) -> tuple:
+    """Return `first` plus already-queued items, up to `max_items`, and whether the end marker (None) was taken."""
+    batch = [first]
+    while len(batch) < max_items and not q.empty():
+        item = q.get_nowait()
+        if item is None:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+async def test_pipeline_throughput():
+    """Test overlapped load -> embed -> upsert -> search over bounded queues."""
+    logger.info("Testing pipeline throughput...")
+    
+    try:
+        rag = await get_rag()
+        run_id = uuid.uuid4().hex[:8]
+        load_q: asyncio.Queue = asyncio.Queue(maxsize=32)
+        upsert_q: asyncio.Queue = asyncio.Queue(maxsize=32)
+        done_ids: list = []
+        
+        async def load():
+            for i in range(_PIPELINE_DOCS):
+                await load_q.put({
+                    'content': f"Pipeline test document {i} of run {run_id}.",
+                    'source_type': 'test',
+                    'metadata': {'test': True, 'run_id': run_id}
+                })
+            await load_q.put(None)
+        
+        async def embed_worker():
+            finished = False
+            while not finished and (doc := await load_q.get()) is not None:
+                batch, finished = _drain(load_q, doc, 16)
+                embeddings = await _retry(lambda: rag.create_embeddings_batch([d['content'] for d in batch]))
+                for d, embedding in zip(batch, embeddings):
+                    await upsert_q.put({**d, 'embedding': embedding})
+            await upsert_q.put(None)
+        
+        async def upsert_worker():
+            finished = False
+            while not finished and (doc := await upsert_q.get()) is not None:
+                batch, finished = _drain(upsert_q, doc, 64)
+                done_ids.extend(await _retry(lambda: rag.store_documents(batch)))
+        
+        start = time.perf_counter()
+        await asyncio.gather(load(), embed_worker(), upsert_worker())
+        results = await _retry(
+            lambda: rag.search_documents(query=f"Pipeline test document 0 of run {run_id}.", limit=1)
+        )
+        elapsed = time.perf_counter() - start
+        
+        rate = len(done_ids) / elapsed
+        if len(done_ids) == _PIPELINE_DOCS and all(done_ids) and results and rate >= _MIN_PIPELINE_DOCS_PER_SEC:
+            logger.info("✅ Pipeline throughput: %.1f docs/s (%d docs in %.2fs)", rate, len(done_ids), elapsed)
+            return True
+        else:
+            logger.error("❌ Pipeline throughput too low or incomplete: %d docs, %.1f docs/s", len(done_ids), rate)
+            return False
+            
+    except Exception as e:
+        logger.error("❌ Pipeline throughput failed: %s", e)
+        return False
+
+async def _timed(test_name: str, aw):
+    """Await one test and log its status and wall time as a single record."""
+    start = time.perf_counter_ns()
+    status = "FAIL"
+    try:
+        result = await aw
+        status = "PASS" if result else "FAIL"
+        return result
+    finally:
+        logger.warning("%s %s %.1fms", test_name, status, (time.perf_counter_ns() - start) / 1e6)
+
+async def _cleanup_test_documents(rag):
+    """Delete every row the tests created (this run and earlier ones) with one DELETE, keeping the index small."""
+    try:
+        result = await asyncio.to_thread(
+            rag.supabase.table('documents').delete().eq('metadata->>test', 'true').execute
+        )
+        logger.info("Removed %d test documents", len(result.data or ()))
+    except Exception as e:
+        logger.warning("Test document cleanup failed: %s", e)
+
+async def _warm_up():
+    """Run one throwaway search so the first timed search doesn't pay for a cold HNSW index and connection."""
+    try:
+        rag = await get_rag()
+        await rag.search_documents("warmup", limit=1)
+    except Exception as e:
+        # The tests themselves report configuration and connection problems
+        logger.info("Warmup search skipped: %s", e)
+
+async def run_tests():
+    """Run all tests concurrently; the blocking sync tests run in worker threads."""
+    await _warm_up()
+    
+    tests = [
+        ("Environment Variables", asyncio.to_thread(test_environment)),
+        ("Database Connection", asyncio.to_thread(test_database_connection)),
+        ("Document Ingestion", test_document_ingestion()),
+        ("Document Search", test_document_search()),
+        ("Agent Integration", test_agent_integration()),
+        ("Pipeline Throughput", test_pipeline_throughput()),
     ]
     
+    # The tests are independent network round trips, so they run concurrently
+    try:
+        outcomes = await asyncio.gather(
+            *(_timed(test_name, coro) for test_name, coro in tests), return_exceptions=True
+        )
+    finally:
+        if _ingester is not None:
+            await _ingester.close()
+        if _rag_preload.done() and _rag_preload.exception() is None:
+            rag = _rag_preload.result()
+            await _cleanup_test_documents(rag)
+            await rag.aclose()
+    
     results = []
-    for test_name, test_func in async_tests:
-        logger.info("")
-        try:
-            result = await test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            logger.error(f"❌ {test_name} failed with exception: {e}")
+    for (test_name, _), outcome in zip(tests, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error("❌ %s failed with exception: %s", test_name, outcome)
             results.append((test_name, False))
+        else:
+            results.append((test_name, outcome))
     
     return results
 
-def main():
+async def main():
     """Run all tests."""
     logger.info("=" * 60)
     logger.info("RAG Integration Test Suite")
     logger.info("=" * 60)
     
-    # Run sync tests
-    sync_tests = [
-        ("Environment Variables", test_environment),
-        ("Database Connection", test_database_connection),
-    ]
-    
-    results = []
-    for test_name, test_func in sync_tests:
-        logger.info("")
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            logger.error(f"❌ {test_name} failed with exception: {e}")
-            results.append((test_name, False))
-    
-    # Run async tests
-    logger.info("")
-    async_results = asyncio.run(run_async_tests())
-    results.extend(async_results)
+    results = await run_tests()
     
     # Summary
-    logger.info("")
-    logger.info("=" * 60)
+    logger.info("=" * 60, extra=_SECTION)
     logger.info("Test Results Summary")
     logger.info("=" * 60)
     
     passed = 0
     for test_name, result in results:
         status = "✅ PASS" if result else "❌ FAIL"
-        logger.info(f"{test_name}: {status}")
+        logger.info("%s: %s", test_name, status)
         if result:
             passed += 1
     
-    logger.info("")
-    logger.info(f"Overall: {passed}/{len(results)} tests passed")
+    logger.warning("Overall: %d/%d tests passed", passed, len(results), extra=_SECTION)
     
     if passed == len(results):
         logger.info("🎉 All tests passed! RAG integration is working correctly.")
@@ -211,5 +411,13 @@ def main():
     return passed == len(results)
 
 if __name__ == "__main__":
-    success = main()
+    # One loop for the whole suite (asyncio.Runner would need Python 3.11)
+    loop = _new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        success = loop.run_until_complete(main())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
     sys.exit(0 if success else 1)
\ No newline at end of file